@@ -0,0 +1,155 @@
+# coding=utf-8
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src')
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+# asset paths in the game are relative to src
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def walk_in_circle(start):
+    def walk(frame):
+        angle = frame / 120 * math.tau
+        return start.x + math.cos(angle) * 300, start.y + math.sin(angle) * 300
+    return walk
+
+
+def run_scenario(name, frames, warmup, seed):
+    os.chdir(SRC_DIR)
+    from scenarios import MAPS, SCENARIOS
+    from simulation import Simulation, headless_display
+
+    load_start = time.perf_counter()
+    tile_map = None
+    if name in MAPS:
+        # generated maps are built from map.tmx, which needs a display to load
+        headless_display()
+        tile_map = MAPS[name]()
+    simulation = Simulation(seed=seed, render=True, tile_map=tile_map)
+    load_time = time.perf_counter() - load_start
+    level = simulation.level
+
+    # scenarios can return the player position for every frame, by default the player walks in a circle
+    walk = SCENARIOS[name](level) or walk_in_circle(level.player.pos.copy())
+    frame_times = []
+    for frame in range(warmup + frames):
+        level.player.pos.update(walk(frame))
+        frame_start = time.perf_counter()
+        simulation.step()
+        if frame >= warmup:
+            frame_times.append((time.perf_counter() - frame_start) * 1000)
+
+    p50, p95, p99 = np.percentile(frame_times, (50, 95, 99))
+    return {
+        'load_s': load_time,
+        'fps': 1000 / float(np.mean(frame_times)),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_rss_mb': max_rss_mb()
+    }
+
+
+def run_all(names, frames, warmup, seed):
+    # every scenario gets a fresh process, so memory numbers do not add up
+    results = {}
+    for name in names:
+        process = subprocess.run(
+            [sys.executable, __file__, '--single', name, '--frames', str(frames), '--warmup', str(warmup), '--seed', str(seed)],
+            capture_output=True, text=True
+        )
+        if process.returncode:
+            # show why the scenario crashed before giving up
+            print(process.stderr, file=sys.stderr)
+            process.check_returncode()
+        results[name] = json.loads(process.stdout.strip().splitlines()[-1])
+        print(f"{name:>14}: {results[name]['fps']:8.1f} fps, p50 {results[name]['p50_ms']:.2f} ms, "
+              f"p95 {results[name]['p95_ms']:.2f} ms, p99 {results[name]['p99_ms']:.2f} ms, "
+              f"loaded in {results[name]['load_s']:.2f} s", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frames': frames,
+            'seed': seed
+        },
+        'scenarios': results
+    }
+
+
+def compare(report, baseline, threshold):
+    # a scenario regresses when its p95 frame time grew by more than threshold
+    regressions = []
+    for name, result in report['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        before = baseline['scenarios'][name]['p95_ms']
+        after = result['p95_ms']
+        change = (after - before) / before
+        status = 'REGRESSION' if change > threshold else 'ok'
+        print(f'{name:>14}: p95 {before:.2f} -> {after:.2f} ms ({change:+.1%}) {status}', file=sys.stderr)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    from scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description='Frame time benchmarks on synthetic Level states.')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help='scenarios to run, all by default')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed p95 slowdown, 0.10 is 10%%')
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_scenario(args.single, args.frames, args.warmup, args.seed)))
+        return 0
+
+    report = run_all(args.scenarios, args.frames, args.warmup, args.seed)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
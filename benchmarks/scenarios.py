@@ -0,0 +1,79 @@
+# coding=utf-8
+import random
+
+from enumerations import SoilFlag
+from settings import *
+from sprites import Tree
+from tilemap import load_map, repeat_map
+
+
+def idle(level):
+    level.raining = False
+
+
+def planted_farm(level):
+    # every farmable tile tilled, watered and planted, grown for a few days
+    level.raining = False
+    soil_layer = level.soil_layer
+    for index, (x, y) in enumerate(soil_layer.grid.tiles(SoilFlag.FARMABLE)):
+        center = ((x + 0.5) * TILE_SIZE, (y + 0.5) * TILE_SIZE)
+        soil_layer.get_hit(center)
+        soil_layer.plant_seed(center, 'corn' if index % 2 else 'tomato')
+    for _ in range(3):
+        soil_layer.water_all()
+        soil_layer.update_plants()
+        soil_layer.remove_water()
+    soil_layer.water_all()
+
+
+def many_trees(level, amount=400):
+    level.raining = False
+    template = level.tree_sprites.sprites()[0]
+    width, height = level.soil_layer.grid.width * TILE_SIZE, level.soil_layer.grid.height * TILE_SIZE
+    rng = random.Random(0)
+    for _ in range(amount):
+        Tree(
+            pos=(rng.randrange(width), rng.randrange(height)),
+            surf=template.tree_surf,
+            groups=[level.all_sprites, level.collision_sprites, level.tree_sprites],
+            all_sprites=level.all_sprites,
+            name=template.name,
+            player_add=level.player_add
+        )
+
+
+def heavy_rain(level):
+    level.raining = True
+    level.rain.rate *= 5
+
+
+def shop_open(level):
+    level.raining = False
+    level.toggle_shop()
+
+
+def large_world(columns=20, rows=25):
+    # map.tmx repeated 20x25 times, a 1000x1000 tile map
+    return repeat_map(load_map('../data/map.tmx'), columns, rows)
+
+
+def large_map(level):
+    # walk diagonally through the repeated world, so chunks keep streaming in and out
+    level.raining = False
+    start = level.player.pos.copy()
+    return lambda frame: (start.x + frame * 8, start.y + frame * 4)
+
+
+SCENARIOS = {
+    'idle': idle,
+    'planted farm': planted_farm,
+    'many trees': many_trees,
+    'heavy rain': heavy_rain,
+    'shop open': shop_open,
+    'large map': large_map
+}
+
+# scenarios that run on a generated map instead of map.tmx
+MAPS = {
+    'large map': large_world
+}
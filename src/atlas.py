@@ -0,0 +1,68 @@
+# coding=utf-8
+import json
+import os
+
+import pygame
+
+from tilemap import pack_images, source_signature
+
+ATLAS_VERSION = 1
+ATLAS_FOLDERS = [
+    '../graphics/character', '../graphics/fruit', '../graphics/overlay', '../graphics/rain', '../graphics/soil',
+    '../graphics/soil_water', '../graphics/stumps', '../graphics/water'
+]
+ATLAS_IMAGE = '../graphics/atlas.png'
+ATLAS_INDEX = '../graphics/atlas.json'
+
+
+def atlas_sources(folders=ATLAS_FOLDERS):
+    # same path format as support.import_folder, so lookups find their atlas entry
+    sources = []
+    for folder in folders:
+        for path, _, files in sorted(os.walk(folder)):
+            sources.extend(f'{path}/{file}' for file in sorted(files) if file.endswith('.png'))
+    return sources
+
+
+def compile_atlas(image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX, folders=ATLAS_FOLDERS):
+    sources = atlas_sources(folders)
+    atlas, rects = pack_images([pygame.image.load(source) for source in sources])
+    index = {
+        'version': ATLAS_VERSION,
+        'signature': source_signature(sources),
+        'images': dict(zip(sources, rects))
+    }
+
+    try:
+        pygame.image.save(atlas, image_path)
+        with open(index_path, 'w') as file:
+            json.dump(index, file)
+    except (OSError, pygame.error):
+        # a read-only install still works, it just packs the atlas on every launch
+        pass
+    return atlas, index
+
+
+def read_atlas(image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX, folders=ATLAS_FOLDERS):
+    try:
+        with open(index_path) as file:
+            index = json.load(file)
+        if index['version'] != ATLAS_VERSION or index['signature'] != source_signature(atlas_sources(folders)):
+            return None
+        return pygame.image.load(image_path), index
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None
+
+
+def load_atlas(alpha_format=None):
+    # returns the atlas surface and the rect of every packed image, compiled again when a source changed,
+    # converting to alpha_format instead of the display format lets this run on a worker thread
+    surface, index = read_atlas() or compile_atlas()
+    surface = surface.convert(alpha_format) if alpha_format else surface.convert_alpha()
+    return surface, index['images']
+
+
+if __name__ == '__main__':
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    compile_atlas()
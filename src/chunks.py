@@ -0,0 +1,57 @@
+# coding=utf-8
+import pygame
+
+from settings import *
+from timer import clock
+
+
+def chunk_rect(chunk, chunk_size=CHUNK_SIZE):
+    return pygame.Rect(chunk[0] * chunk_size, chunk[1] * chunk_size, chunk_size, chunk_size)
+
+
+def bake_tiles(tiles, rect):
+    # blit (x, y, surf) tiles onto one surface covering rect, None when there are no tiles
+    surf = None
+    for x, y, tile in tiles:
+        if surf is None:
+            surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+        surf.blit(tile, (x * TILE_SIZE - rect.left, y * TILE_SIZE - rect.top))
+    return surf
+
+
+class AnimatedTileLayer:
+    def __init__(self, frames, speed, chunk_size=CHUNK_SIZE):
+        # one baked surface per animation frame and chunk, all chunks share the game clock
+        self.frames = frames
+        self.speed = speed
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.chunk_rects = {}
+
+    def bake_chunk(self, chunk, tiles):
+        # does not touch the display, so it can run on a streaming thread
+        rect = chunk_rect(chunk, self.chunk_size)
+        if not tiles:
+            return None
+        return [bake_tiles([(x, y, frame) for x, y in tiles], rect) for frame in self.frames]
+
+    def add_chunk(self, chunk, chunk_frames):
+        if chunk_frames:
+            self.chunks[chunk] = [surf.convert_alpha() for surf in chunk_frames]
+            self.chunk_rects[chunk] = chunk_rect(chunk, self.chunk_size)
+
+    def remove_chunk(self, chunk):
+        self.chunks.pop(chunk, None)
+        self.chunk_rects.pop(chunk, None)
+
+    @property
+    def frame_index(self):
+        return int(clock.get_ticks() / 1000 * self.speed) % len(self.frames)
+
+    def render(self, view_rect, alpha=1):
+        frame_index = self.frame_index
+        offset = (-view_rect.left, -view_rect.top)
+        return [
+            (self.chunks[chunk][frame_index], rect.move(offset))
+            for chunk, rect in self.chunk_rects.items() if rect.colliderect(view_rect)
+        ]
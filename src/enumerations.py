@@ -12,3 +12,9 @@ class Seeds(enum.Enum):
     CORN = 'corn'
     TOMATO = 'tomato'
 
+
+class SoilFlag(enum.IntFlag):
+    FARMABLE = 1
+    TILLED = 2
+    WATERED = 4
+    PLANTED = 8
@@ -1,97 +1,101 @@
 # coding=utf-8
+import itertools
+import operator
 import random
 
 import pygame
-from pytmx.util_pygame import load_pygame
 
+from chunks import AnimatedTileLayer, bake_tiles, chunk_rect
+from lighting import Lighting
 from menu import Menu
 from overlay import Overlay
 from player import Player
+from profiler import profiler
+from savegame import Autosaver, read_save
 from settings import *
 from sky import Rain, Sky
 from soil import SoilLayer
-from sprites import Generic, Water, WildFlower, Tree, Interaction, Particle
-from support import import_folder
+from spatial import CollisionGroup, SpatialGrid
+from sprites import Generic, WildFlower, Tree, Interaction, Particle
+from streaming import WorldStreamer
+from support import import_folder, load_image, load_sound
+from tilemap import load_map
+from timer import clock, ui_clock
 from transition import Transition
 
+sort_key = operator.attrgetter('rect.centery')
+
 
 class Level:
-    def __init__(self):
+    def __init__(self, map_path='../data/map.tmx', streaming_workers=STREAMING_WORKERS, save_path=None, tile_map=None):
+        # an already built tile_map is used instead of loading map_path
         self.player = None
+        self.tmx_data = tile_map if tile_map is not None else load_map(map_path)
 
         # get thr display surface
         self.display_surface = pygame.display.get_surface()
 
         # sprite groups
         self.all_sprites = CameraGroup()
-        self.collision_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionGroup(COLLISION_CELL_SIZE)
         self.tree_sprites = pygame.sprite.Group()
         self.interaction_sprites = pygame.sprite.Group()
 
-        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites)
-        self.setup()
+        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites, self.tmx_data)
+        self.collision_surf = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        self.setup(streaming_workers)
         self.overlay = Overlay(self.player)
         self.transition = Transition(self.reset, self.player)
 
         # sky
-        self.rain = Rain(self.all_sprites)
+        self.rain = Rain(self.all_sprites, (self.tmx_data.width * TILE_SIZE, self.tmx_data.height * TILE_SIZE))
         self.raining = False
         self.soil_layer.raining = self.raining
         self.sky = Sky()
+        self.lighting = Lighting(self.sky, self.transition)
 
         # shop
         self.menu = Menu(self.player, self.toggle_shop)
         self.shop_active = False
 
+        # the world behind modal screens is composed once and reused while they are open
+        self.world_snapshot = None
+        self.modal_rects = []
+
         # sound
-        self.success_sound = pygame.mixer.Sound('../audio/success.wav')
+        self.success_sound = load_sound('../audio/success.wav')
         self.success_sound.set_volume(0.3)
-        self.music = pygame.mixer.Sound('../audio/music.mp3')
-        self.music.set_volume(0.1)
-        self.music.play(loops=-1)
 
-    def setup(self):
-        tmx_data = load_pygame('../data/map.tmx')
-
-        # house
-        for layer in ['HouseFloor', 'HouseFurnitureBottom']:
-            for x, y, surf in tmx_data.get_layer_by_name(layer).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, LAYERS['house bottom'])
-
-        for layer in ['HouseWalls', 'HouseFurnitureTop']:
-            for x, y, surf in tmx_data.get_layer_by_name(layer).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites)
-
-        # Fence
-        for x, y, surf in tmx_data.get_layer_by_name('Fence').tiles():
-            Generic((x * TILE_SIZE, y * TILE_SIZE), surf, [self.all_sprites, self.collision_sprites])
-
-        # water
-        water_frames = import_folder('../graphics/water')
-        for x, y, _ in tmx_data.get_layer_by_name('Water').tiles():
-            Water((x * TILE_SIZE, y * TILE_SIZE), water_frames, self.all_sprites)
-
-        # trees
-        for obj in tmx_data.get_layer_by_name('Trees'):
-            Tree(
-                pos=(obj.x, obj.y),
-                surf=obj.image,
-                groups=[self.all_sprites, self.collision_sprites, self.tree_sprites],
-                name=obj.name,
-                player_add=self.player_add
-            )
-
-        # wildflowers
-        for obj in tmx_data.get_layer_by_name('Decoration'):
-            WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites])
-
-        # collision tiles
-        for x, y, _ in tmx_data.get_layer_by_name('Collision').tiles():
-            Generic(
-                (x * TILE_SIZE, y * TILE_SIZE),
-                pygame.Surface((TILE_SIZE, TILE_SIZE)),
-                self.collision_sprites
-            )
+        # music is streamed from disk instead of decoded into memory up front
+        pygame.mixer.music.load('../audio/music.mp3')
+        pygame.mixer.music.set_volume(0.1)
+        pygame.mixer.music.play(loops=-1)
+
+        # continue a saved game, then stream in the world around the player
+        self.autosaver = Autosaver(save_path) if save_path else None
+        if save_path:
+            state = read_save(save_path, (self.tmx_data.width, self.tmx_data.height))
+            if state:
+                self.set_state(state)
+        self.world.update(self.player.rect.center, wait=True)
+
+    def setup(self, streaming_workers):
+        tmx_data = self.tmx_data
+
+        # the world is split into chunks that are streamed in around the camera
+        self.ground_surf = load_image('../graphics/world/ground.png')
+        self.water = AnimatedTileLayer(import_folder('../graphics/water'), speed=5)
+        self.all_sprites.add_renderer(LAYERS['water'], self.water.render)
+        self.chunk_objects = {}
+        for layer in ['Trees', 'Decoration']:
+            for index, obj in enumerate(tmx_data.get_layer_by_name(layer)):
+                chunk = (int(obj.x // CHUNK_SIZE), int(obj.y // CHUNK_SIZE))
+                self.chunk_objects.setdefault(chunk, []).append((layer, index, obj))
+
+        # sprites of the loaded chunks, and the state of trees whose chunk is unloaded
+        self.chunk_sprites = {}
+        self.chunk_trees = {}
+        self.tree_states = {}
 
         # player
         for obj in tmx_data.get_layer_by_name('Player'):
@@ -112,21 +116,124 @@ class Level:
             if obj.name == 'Trader':
                 Interaction((obj.x, obj.y), (obj.width, obj.height), self.interaction_sprites, obj.name)
 
-        # ground
-        Generic(
-            pos=(0, 0),
-            surf=pygame.image.load('../graphics/world/ground.png').convert_alpha(),
-            groups=self.all_sprites,
-            z=LAYERS['ground']
+        self.world = WorldStreamer(
+            (tmx_data.width * TILE_SIZE, tmx_data.height * TILE_SIZE),
+            self.prepare_chunk, self.load_chunk, self.unload_chunk,
+            workers=streaming_workers
+        )
+
+    def prepare_chunk(self, chunk):
+        # runs on a streaming thread: bakes the chunk's surfaces and collects its tiles
+        tmx_data = self.tmx_data
+        rect = chunk_rect(chunk)
+        area = (rect.left // TILE_SIZE, rect.top // TILE_SIZE, CHUNK_SIZE // TILE_SIZE, CHUNK_SIZE // TILE_SIZE)
+
+        # ground from the pre-rendered image where there is one, from the ground tile layers elsewhere
+        ground_rect = self.ground_surf.get_rect()
+        if ground_rect.colliderect(rect):
+            ground = self.ground_surf.subsurface(rect.clip(ground_rect))
+        else:
+            ground = bake_tiles(
+                [tile for layer in GROUND_LAYERS for tile in tmx_data.get_layer_by_name(layer).tiles_in(*area)], rect
+            )
+
+        # house floor and furniture are always below the player, so they are baked into the chunk
+        house_bottom = bake_tiles(
+            [
+                tile for layer in ['HouseFloor', 'HouseFurnitureBottom']
+                for tile in tmx_data.get_layer_by_name(layer).tiles_in(*area)
+            ],
+            rect
         )
+        water = self.water.bake_chunk(chunk, [(x, y) for x, y, _ in tmx_data.get_layer_by_name('Water').tiles_in(*area)])
+        tiles = {
+            layer: list(tmx_data.get_layer_by_name(layer).tiles_in(*area))
+            for layer in ['HouseWalls', 'HouseFurnitureTop', 'Fence', 'Collision']
+        }
+        return ground, house_bottom, water, tiles
+
+    def load_chunk(self, chunk, prepared):
+        ground, house_bottom, water, tiles = prepared
+        rect = chunk_rect(chunk)
+        sprites = []
+
+        if ground:
+            sprites.append(Generic(rect.topleft, ground.convert_alpha(), self.all_sprites, LAYERS['ground']))
+        if house_bottom:
+            sprites.append(Generic(rect.topleft, house_bottom.convert_alpha(), self.all_sprites, LAYERS['house bottom']))
+        self.water.add_chunk(chunk, water)
+
+        for layer in ['HouseWalls', 'HouseFurnitureTop']:
+            for x, y, surf in tiles[layer]:
+                sprites.append(Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites))
+
+        # Fence
+        for x, y, surf in tiles['Fence']:
+            sprites.append(Generic((x * TILE_SIZE, y * TILE_SIZE), surf, [self.all_sprites, self.collision_sprites]))
+
+        # collision tiles
+        for x, y, _ in tiles['Collision']:
+            sprites.append(Generic((x * TILE_SIZE, y * TILE_SIZE), self.collision_surf, self.collision_sprites))
+
+        # trees keep their state while their chunk is unloaded, wildflowers
+        trees = {}
+        for layer, index, obj in self.chunk_objects.get(chunk, []):
+            if layer == 'Trees':
+                trees[index] = Tree(
+                    pos=(obj.x, obj.y),
+                    surf=obj.image,
+                    groups=[self.all_sprites, self.collision_sprites, self.tree_sprites],
+                    all_sprites=self.all_sprites,
+                    name=obj.name,
+                    player_add=self.player_add
+                )
+                if index in self.tree_states:
+                    trees[index].set_state(self.tree_states.pop(index))
+            else:
+                sprites.append(WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites]))
+
+        self.chunk_sprites[chunk] = sprites
+        self.chunk_trees[chunk] = trees
+        self.soil_layer.load_area(*(value // TILE_SIZE for value in rect))
+
+    def unload_chunk(self, chunk):
+        for sprite in self.chunk_sprites.pop(chunk):
+            sprite.kill()
+        for index, tree in self.chunk_trees.pop(chunk).items():
+            self.tree_states[index] = tree.get_state()
+            tree.unload()
+        self.water.remove_chunk(chunk)
+        self.soil_layer.unload_area(*(value // TILE_SIZE for value in chunk_rect(chunk)))
+
+    def get_state(self):
+        # copies only, so the autosave thread can serialize it while the game goes on
+        tree_states = dict(self.tree_states)
+        for trees in self.chunk_trees.values():
+            for index, tree in trees.items():
+                tree_states[index] = tree.get_state()
+        return {
+            'player': self.player.get_state(),
+            'soil': self.soil_layer.get_state(),
+            'trees': tree_states,
+            'raining': self.raining
+        }
+
+    def set_state(self, state):
+        # must run before any chunk is loaded
+        self.player.set_state(state['player'])
+        self.soil_layer.set_state(state['soil'])
+        self.tree_states = state['trees']
+        self.raining = state['raining']
+        self.soil_layer.raining = self.raining
 
     def player_add(self, item):
-        self.player.item_inventory[item] += 1
+        self.player.change_items(item, 1)
         self.success_sound.play()
 
     def toggle_shop(self):
 
         self.shop_active = not self.shop_active
+        self.world_snapshot = None
 
     def reset(self):
 
@@ -142,7 +249,8 @@ class Level:
         if self.raining:
             self.soil_layer.water_all()
 
-        # trees and apples on it
+        # trees and apples on it, trees of unloaded chunks come back fresh when they load
+        self.tree_states.clear()
         for tree in self.tree_sprites.sprites():
             tree.restore()
             for apple in tree.apple_sprites.sprites():
@@ -150,47 +258,96 @@ class Level:
             tree.create_fruit()
 
         # sky
-        self.sky.current_color = self.sky.start_color
+        self.sky.time = 0
+
+        # autosave
+        if self.autosaver:
+            self.autosaver.save(self.get_state())
 
     def plant_collision(self):
         if self.soil_layer.plant_sprites:
-            for plant in self.soil_layer.plant_sprites.sprites():
-                if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
+            for plant in list(self.soil_layer.harvestable_plants(self.player.hitbox)):
+                if plant.rect.colliderect(self.player.hitbox):
                     self.player_add(plant.plant_type)
-                    plant.kill()
+                    self.soil_layer.remove_plant(plant)
                     Particle(
                         pos=plant.rect.topleft,
                         surf=plant.image,
                         groups=self.all_sprites,
                         z=LAYERS['main']
                     )
-                    row = plant.rect.centerx // TILE_SIZE
-                    col = plant.rect.centery // TILE_SIZE
-                    self.soil_layer.grid[col][row].remove('P')
 
-    def run(self, dt):
-        # drawing logic
-        self.display_surface.fill('black')
-        self.all_sprites.custom_draw(self.player)
+    def run(self, dt, render=True):
+        self.update(dt)
+        if render:
+            self.draw()
+
+    def update(self, dt):
+        # scheduled timers fire while the clocks advance, world time can be paused or scaled,
+        # it stands still while the shop is open and during the sleep transition
+        clock.paused = self.shop_active or self.player.sleep
+        ui_clock.tick(dt)
+        world_dt = clock.tick(dt)
 
         # updates
         if self.shop_active:
-            self.menu.update()
+            with profiler.scope('menu'):
+                self.menu.input()
         else:
-            self.all_sprites.update(dt)
-            self.plant_collision()
-
-        # UI overlay
-        self.overlay.display()
+            with profiler.scope('update'):
+                self.all_sprites.update(world_dt)
+            with profiler.scope('plant collision'):
+                self.plant_collision()
+            with profiler.scope('streaming'):
+                self.world.update(self.player.rect.center)
 
         # weather
-        if self.raining and not self.shop_active:
-            self.rain.update()
-        self.sky.display(dt)
+        if not self.shop_active:
+            with profiler.scope('rain'):
+                self.rain.update(world_dt, self.player.rect.center, spawn=self.raining)
+        self.sky.update(world_dt)
 
         # transition overlay
         if self.player.sleep:
-            self.transition.play()
+            self.transition.play(dt)
+
+    def draw(self, alpha=1):
+        # returns the changed screen rects, or None when the whole screen changed and must be presented
+        if self.shop_active:
+            return self.draw_modal(self.menu, alpha)
+        self.draw_world(alpha)
+        return None
+
+    def draw_world(self, alpha):
+        # alpha is the fraction of a simulation step that passed since the last update
+        with profiler.scope('draw'):
+            self.display_surface.fill('black')
+            self.all_sprites.custom_draw(self.player, alpha)
+
+        # UI overlay
+        with profiler.scope('overlay'):
+            self.overlay.display()
+
+        # day/night tint and sleep fade in one pass
+        with profiler.scope('sky'):
+            self.lighting.display()
+
+    def draw_modal(self, modal, alpha):
+        # nothing in the world moves behind a modal screen, so only the modal's own area is redrawn
+        if self.world_snapshot is None:
+            self.draw_world(alpha)
+            self.world_snapshot = self.display_surface.copy()
+            dirty = None
+        elif not modal.changed:
+            return []
+        else:
+            dirty = self.modal_rects
+            for rect in dirty:
+                self.display_surface.blit(self.world_snapshot, rect, rect)
+
+        with profiler.scope('menu'):
+            self.modal_rects = modal.display()
+        return None if dirty is None else dirty + self.modal_rects
 
 
 class CameraGroup(pygame.sprite.Group):
@@ -199,22 +356,118 @@ class CameraGroup(pygame.sprite.Group):
         self.display_surface = pygame.display.get_surface()
         self.offset = pygame.math.Vector2()
 
-    def custom_draw(self, player):
-        self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
-        self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
-
-        for layer in LAYERS.values():
-            for sprite in sorted(self.sprites(), key=lambda sprite_obj: sprite_obj.rect.centery):
-                if sprite.z == layer:
-                    offset_rect = sprite.rect.copy()
-                    offset_rect.center -= self.offset
-                    self.display_surface.blit(sprite.image, offset_rect)
-
-                    # # debug graphics
-                    # if sprite == player:
-                    #     pygame.draw.rect(self.display_surface, 'red', offset_rect, 5)
-                    #     hitbox_rect = player.hitbox.copy()
-                    #     hitbox_rect.center = offset_rect.center
-                    #     pygame.draw.rect(self.display_surface, 'green', hitbox_rect, 5)
-                    #     target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
-                    #     pygame.draw.circle(self.display_surface, 'blue', target_pos, 5)
+        # render queue: one spatial index per z layer, in drawing order
+        self.layers = {layer: SpatialGrid(SPATIAL_CELL_SIZE) for layer in sorted(LAYERS.values())}
+        self.sprite_layers = {}
+        self.draw_order = {}
+        self.sprite_counter = itertools.count()
+
+        # per layer the view's cells and their sprites in drawing order, sorted again only when dirty
+        self.layer_orders = {}
+        self.dirty_layers = set(self.layers)
+
+        # non-sprite drawing hooked into the layer order, e.g. particle systems
+        self.layer_renderers = {}
+
+        # sprites that may move during update() and have to be re-indexed afterwards,
+        # with their position before the last update for render interpolation
+        self.dynamic_sprites = {}
+        self.previous_positions = {}
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        z = sprite.z
+        self.sprite_layers[sprite] = z
+        self.draw_order[sprite] = next(self.sprite_counter)
+        self.layers[z].insert(sprite, sprite.rect)
+        self.dirty_layers.add(z)
+        if type(sprite).update is not pygame.sprite.Sprite.update:
+            self.dynamic_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        z = self.sprite_layers.pop(sprite)
+        del self.draw_order[sprite]
+        self.layers[z].remove(sprite)
+        self.dirty_layers.add(z)
+        self.dynamic_sprites.pop(sprite, None)
+        self.previous_positions.pop(sprite, None)
+
+    def change_layer(self, sprite, z):
+        if sprite in self.sprite_layers:
+            self.remove_internal(sprite)
+            sprite.z = z
+            self.add_internal(sprite)
+        else:
+            sprite.z = z
+
+    def reposition(self, sprite):
+        z = self.sprite_layers[sprite]
+        self.layers[z].move(sprite, sprite.rect)
+        self.dirty_layers.add(z)
+
+    def update(self, *args, **kwargs):
+        self.previous_positions = {sprite: sprite.rect.topleft for sprite in self.dynamic_sprites}
+        super().update(*args, **kwargs)
+        for sprite in list(self.dynamic_sprites):
+            z = self.sprite_layers.get(sprite)
+            if z is None:
+                continue
+            # y-sorted layers change order when a sprite moves, the others only when it changes cells
+            moved = self.layers[z].move(sprite, sprite.rect)
+            if moved or (z in Y_SORTED_LAYERS and sprite.rect.topleft != self.previous_positions[sprite]):
+                self.dirty_layers.add(z)
+
+    def interpolated_rect(self, sprite, alpha):
+        # blend between the last two simulation steps, teleports and growth jumps are not smoothed
+        previous = self.previous_positions.get(sprite)
+        if previous is None or alpha >= 1:
+            return sprite.rect
+        dx, dy = sprite.rect.left - previous[0], sprite.rect.top - previous[1]
+        if abs(dx) > TILE_SIZE or abs(dy) > TILE_SIZE:
+            return sprite.rect
+        return sprite.rect.move(round(dx * (alpha - 1)), round(dy * (alpha - 1)))
+
+    def add_renderer(self, layer, renderer):
+        # renderer(view_rect, alpha) returns (surface, screen position) pairs drawn on top of the layer's sprites
+        self.layer_renderers.setdefault(layer, []).append(renderer)
+
+    def render_queue(self, view_rect, alpha=1):
+        offset = (-view_rect.left, -view_rect.top)
+        for layer, spatial_index in self.layers.items():
+            cells = spatial_index.cell_range(view_rect)
+            cells_in_order = self.layer_orders.get(layer)
+            if layer in self.dirty_layers or cells_in_order is None or cells_in_order[0] != cells:
+                visible = list(spatial_index.query(view_rect))
+                visible.sort(key=self.draw_order.__getitem__)
+                if layer in Y_SORTED_LAYERS:
+                    visible.sort(key=sort_key)
+                self.layer_orders[layer] = cells_in_order = (cells, visible)
+                self.dirty_layers.discard(layer)
+
+            for sprite in cells_in_order[1]:
+                if sprite in self.previous_positions:
+                    yield sprite.image, self.interpolated_rect(sprite, alpha).move(offset)
+                else:
+                    yield sprite.image, sprite.rect.move(offset)
+
+            for renderer in self.layer_renderers.get(layer, ()):
+                yield from renderer(view_rect, alpha)
+
+    def custom_draw(self, player, alpha=1):
+        player_rect = self.interpolated_rect(player, alpha)
+        self.offset.x = player_rect.centerx - SCREEN_WIDTH / 2
+        self.offset.y = player_rect.centery - SCREEN_HEIGHT / 2
+        offset = (-round(self.offset.x), -round(self.offset.y))
+
+        view_rect = self.display_surface.get_rect(topleft=(-offset[0], -offset[1]))
+        self.display_surface.blits(list(self.render_queue(view_rect, alpha)), doreturn=False)
+
+        # # debug graphics
+        # offset_rect = player.rect.move(offset)
+        # pygame.draw.rect(self.display_surface, 'red', offset_rect, 5)
+        # hitbox_rect = player.hitbox.copy()
+        # hitbox_rect.center = offset_rect.center
+        # pygame.draw.rect(self.display_surface, 'green', hitbox_rect, 5)
+        # target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
+        # pygame.draw.circle(self.display_surface, 'blue', target_pos, 5)
@@ -0,0 +1,23 @@
+import pygame
+
+
+class Lighting:
+    def __init__(self, sky, transition):
+        self.display_surface = pygame.display.get_surface()
+        self.sky = sky
+        self.transition = transition
+
+        # multiply tint for the whole screen, refilled only when the quantized colour changes
+        self.tint_surf = pygame.Surface(self.display_surface.get_size())
+        self.color = None
+
+    def display(self):
+        brightness = self.transition.brightness
+        color = tuple(int(channel * brightness / 255) for channel in self.sky.color)
+        if color != self.color:
+            self.color = color
+            self.tint_surf.fill(color)
+
+        # multiplying by white is a no-op
+        if color != (255, 255, 255):
+            self.display_surface.blit(self.tint_surf, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
@@ -0,0 +1,58 @@
+# coding=utf-8
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pygame
+
+from settings import *
+from support import assets
+
+# every image and sound the level uses, sprite graphics come from the atlas and music is streamed
+IMAGE_FOLDERS = ['../graphics/world']
+SOUNDS = ['../audio/axe.mp3', '../audio/hoe.wav', '../audio/plant.wav', '../audio/success.wav', '../audio/water.mp3']
+
+
+def asset_manifest():
+    images = []
+    for folder in IMAGE_FOLDERS:
+        for path, _, files in os.walk(folder):
+            images.extend(f'{path}/{file}' for file in sorted(files) if file.endswith('.png'))
+    return images, SOUNDS
+
+
+class LoadingScreen:
+    def __init__(self):
+        self.display_surface = pygame.display.get_surface()
+        self.font = pygame.font.Font('../font/LycheeSoda.ttf', 30)
+        self.bar_rect = pygame.Rect(0, 0, SCREEN_WIDTH // 2, 24)
+        self.bar_rect.center = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+
+    def display(self, done, total):
+        self.display_surface.fill('black')
+        text_surf = self.font.render(f'Loading {done}/{total}', False, 'White')
+        self.display_surface.blit(text_surf, text_surf.get_rect(midbottom=(self.bar_rect.centerx, self.bar_rect.top - 10)))
+
+        fill_rect = self.bar_rect.copy()
+        fill_rect.width = self.bar_rect.width * done // max(total, 1)
+        pygame.draw.rect(self.display_surface, 'White', fill_rect, 0, 4)
+        pygame.draw.rect(self.display_surface, 'White', self.bar_rect, 2, 4)
+        pygame.display.update()
+
+
+def load_assets(workers=None):
+    # decode all assets on a thread pool, the loading screen keeps the window responsive meanwhile
+    loading_screen = LoadingScreen()
+    images, sounds = asset_manifest()
+    with ThreadPoolExecutor(workers, thread_name_prefix='assets') as executor:
+        futures = assets.load_async(executor, images, sounds)
+        pending = futures
+        while pending:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    pygame.quit()
+                    sys.exit()
+            loading_screen.display(len(futures) - len(pending), len(futures))
+            pending = wait(pending, timeout=1 / 60).not_done
+    assets.collect()
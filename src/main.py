@@ -3,26 +3,49 @@ import sys
 
 from settings import *
 from level import Level
+from loading import load_assets
+from profiler import profiler
 
 
 class Game:
     def __init__(self):
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.screen = pygame.display.set_mode(
+            (SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED if VSYNC else 0, vsync=int(VSYNC)
+        )
         pygame.display.set_caption('Sprout Land')
         self.clock = pygame.time.Clock()
-        self.level = Level()
+        load_assets()
+        self.level = Level(save_path=SAVE_PATH)
+
+        # simulation runs in fixed steps, rendering interpolates between them
+        self.accumulator = 0
 
     def run(self):
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    profiler.dump(PROFILER_DUMP_PATH)
                     pygame.quit()
                     sys.exit()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle()
 
-            dt = self.clock.tick() / 1000
-            self.level.run(dt)
-            pygame.display.update()
+            frame_time = min(self.clock.tick(FRAME_RATE_CAP) / 1000, MAX_FRAME_TIME)
+            self.accumulator += frame_time
+            with profiler.scope('level'):
+                while self.accumulator >= SIMULATION_STEP:
+                    self.level.update(SIMULATION_STEP)
+                    self.accumulator -= SIMULATION_STEP
+                dirty_rects = self.level.draw(self.accumulator / SIMULATION_STEP)
+            profiler.display(self.screen)
+            with profiler.scope('display update'):
+                # the profiler overlay is not part of the level's changed rects
+                if dirty_rects is None or profiler.enabled:
+                    pygame.display.update()
+                else:
+                    pygame.display.update(dirty_rects)
+            profiler.end_frame()
 
 
 if __name__ == '__main__':
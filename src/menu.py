@@ -1,6 +1,7 @@
 import pygame
 from settings import *
-from timer import Timer
+from support import TextCache
+from timer import Timer, ui_clock
 
 
 class Menu:
@@ -15,6 +16,7 @@ class Menu:
         self.player = player
         self.display_surface = pygame.display.get_surface()
         self.font = pygame.font.Font('../font/LycheeSoda.ttf', 30)
+        self.text = TextCache(self.font)
 
         # options
         self.width = 400
@@ -28,11 +30,17 @@ class Menu:
 
         # movement
         self.index = 0
-        self.timer = Timer(200)
+        self.timer = Timer(200, clock=ui_clock)
+
+        # the menu is only redrawn after the selection or the player's inventory changed
+        self.changed = True
+        self.player.inventory_listeners.append(self.refresh)
+
+    def refresh(self):
+        self.changed = True
 
     def input(self):
         keys = pygame.key.get_pressed()
-        self.timer.update()
 
         if not self.timer.active:
             if keys[pygame.K_ESCAPE]:
@@ -43,12 +51,14 @@ class Menu:
                 if self.index < 0:
                     self.index = len(self.options) - 1
                 self.timer.activate()
+                self.refresh()
 
             if keys[pygame.K_DOWN]:
                 self.index += 1
                 if self.index > len(self.options) - 1:
                     self.index = 0
                 self.timer.activate()
+                self.refresh()
 
             if keys[pygame.K_SPACE]:
                 self.timer.activate()
@@ -57,12 +67,12 @@ class Menu:
                 current_item = self.options[self.index]
                 if self.index <= self.sell_border:
                     if self.player.item_inventory[current_item] > 0:
-                        self.player.item_inventory[current_item] -= 1
-                        self.player.money += SALE_PRICES[current_item]
+                        self.player.change_items(current_item, -1)
+                        self.player.change_money(SALE_PRICES[current_item])
                 else:
                     if self.player.money > PURCHASE_PRICES[current_item]:
-                        self.player.money -= PURCHASE_PRICES[current_item]
-                        self.player.seed_inventory[current_item] += 1
+                        self.player.change_money(-PURCHASE_PRICES[current_item])
+                        self.player.change_seeds(current_item, 1)
 
     def show_entry(self, text_surf, price_surf, amount, top, selected):
         # background
@@ -74,7 +84,7 @@ class Menu:
         self.display_surface.blit(text_surf, text_rect)
 
         # amount
-        amount_surf = self.font.render(str(amount), False, 'Black')
+        amount_surf = self.text.render(str(amount))
         amount_rect = amount_surf.get_rect(midright=(self.main_rect.right - 20, bg_rect.centery))
         self.display_surface.blit(amount_surf, amount_rect)
 
@@ -92,20 +102,22 @@ class Menu:
                 pos_rect = self.buy_text.get_rect(midleft=(self.main_rect.left + 150, bg_rect.centery))
                 self.display_surface.blit(self.sell_text, pos_rect)
 
-    def update(self):
-        self.input()
-        self.display_money()
+    def display(self):
+        # returns the screen rects the menu covers
+        self.changed = False
+        money_rect = self.display_money()
+        amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
         for text_index, (text_surf, price_surf) in enumerate(zip(self.text_surfs, self.price_surfs)):
             top = self.main_rect.top + text_index * (text_surf.get_height() + (self.padding * 2) + self.space)
-            amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
-            amount = amount_list[text_index]
-            self.show_entry(text_surf, price_surf, amount, top, self.index == text_index)
+            self.show_entry(text_surf, price_surf, amount_list[text_index], top, self.index == text_index)
+        return [self.main_rect, money_rect]
 
     def display_money(self):
-        text_surf = self.font.render(f'${self.player.money}', False, 'Black')
+        text_surf = self.text.render(f'${self.player.money}')
         text_rect = text_surf.get_rect(midbottom=(SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20))
-        pygame.draw.rect(self.display_surface, 'White', text_rect.inflate(10, 10), 0, 4)
+        bg_rect = pygame.draw.rect(self.display_surface, 'White', text_rect.inflate(10, 10), 0, 4)
         self.display_surface.blit(text_surf, text_rect)
+        return bg_rect
 
     def setup(self):
         # create text surfaces
@@ -114,8 +126,8 @@ class Menu:
         self.total_height = 0
         for item_index, item in enumerate(self.options):
             price = PURCHASE_PRICES[item] if item_index > self.sell_border else SALE_PRICES[item]
-            price_surf = self.font.render(f'${price}', False, 'Black')
-            text_surf = self.font.render(item, False, 'Black')
+            price_surf = self.text.render(f'${price}')
+            text_surf = self.text.render(item)
             self.text_surfs.append(text_surf)
             self.price_surfs.append(price_surf)
             self.total_height += text_surf.get_height() + (self.padding * 2)
@@ -126,5 +138,5 @@ class Menu:
         self.main_rect = pygame.Rect(menu_left, menu_top, self.width, self.total_height)
 
         # buy/sell text surface
-        self.buy_text = self.font.render('buy', False, 'Black')
-        self.sell_text = self.font.render('sell', False, 'Black')
+        self.buy_text = self.text.render('buy')
+        self.sell_text = self.text.render('sell')
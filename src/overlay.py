@@ -2,6 +2,7 @@ import pygame
 
 import settings
 from settings import *
+from support import load_image
 
 
 class Overlay:
@@ -13,29 +14,46 @@ class Overlay:
 
         # imports
         overlay_path = '../graphics/overlay/'
-        self.tools_surf = {
-            tool: pygame.image.load(f'{overlay_path}{tool}.png').convert_alpha() for tool in player.tools
-        }
-        self.seeds_surf = {
-            seed: pygame.image.load(f'{overlay_path}{seed}.png').convert_alpha() for seed in player.seeds
-        }
-
-    def display(self):
+        self.tools_surf = {tool: load_image(f'{overlay_path}{tool}.png') for tool in player.tools}
+        self.seeds_surf = {seed: load_image(f'{overlay_path}{seed}.png') for seed in player.seeds}
+        self.inventory_surf = None
+
+        # the HUD is composed into one surface and rebuilt only when what it shows changes
+        self.hud_surf = None
+        self.hud_rect = None
+        self.hud_state = None
+
+    def inventory_panel(self):
+        # inventory slots, scaled once on first use
+        if self.inventory_surf is None:
+            inventory_surf = load_image('../graphics/UI/inventory_slots.png')
+            self.inventory_surf = pygame.transform.scale(inventory_surf, (inventory_surf.get_width() // 3, inventory_surf.get_height() // 3))
+        return self.inventory_surf
+
+    def widgets(self):
         # tools
         tool_surf = self.tools_surf[self.player.selected_tool]
-        tool_rect = tool_surf.get_rect(midbottom=OVERLAY_POSITIONS['tool'])
-        self.display_surface.blit(tool_surf, tool_rect)
+        yield tool_surf, tool_surf.get_rect(midbottom=OVERLAY_POSITIONS['tool'])
 
         # seeds
         seed_surf = self.seeds_surf[self.player.selected_seed]
-        seed_rect = seed_surf.get_rect(midbottom=OVERLAY_POSITIONS['seed'])
-        self.display_surface.blit(seed_surf, seed_rect)
+        yield seed_surf, seed_surf.get_rect(midbottom=OVERLAY_POSITIONS['seed'])
 
         # inventory
         if self.show_inventory:
-            # inventory slots
-            inventory_surf = pygame.image.load('../graphics/UI/inventory_slots.png').convert_alpha()
-            inventory_surf = pygame.transform.scale(inventory_surf, (inventory_surf.get_width() // 3, inventory_surf.get_height() // 3))
-            inventory_rect = inventory_surf.get_rect(bottomright=(settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT))
-            self.display_surface.blit(inventory_surf, inventory_rect)
+            panel_surf = self.inventory_panel()
+            yield panel_surf, panel_surf.get_rect(bottomright=(settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT))
 
+    def compose(self):
+        widgets = list(self.widgets())
+        self.hud_rect = widgets[0][1].unionall([rect for _, rect in widgets[1:]])
+        self.hud_surf = pygame.Surface(self.hud_rect.size, pygame.SRCALPHA)
+        offset = (-self.hud_rect.left, -self.hud_rect.top)
+        self.hud_surf.blits([(surf, rect.move(offset)) for surf, rect in widgets], doreturn=False)
+
+    def display(self):
+        state = (self.player.selected_tool, self.player.selected_seed, self.show_inventory)
+        if state != self.hud_state:
+            self.compose()
+            self.hud_state = state
+        self.display_surface.blit(self.hud_surf, self.hud_rect)
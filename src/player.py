@@ -5,7 +5,8 @@ import pygame
 
 from exceptions import UnsupportedDirectionException
 from settings import *
-from support import import_folder
+from spatial import reposition
+from support import import_folder, load_sound
 from timer import Timer
 
 
@@ -34,7 +35,7 @@ class PlayerStatus:
 
 class Player(pygame.sprite.Sprite):
     def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer, toggle_shop):
-        super().__init__(group)
+        super().__init__()
 
         self.animations = {'up': [], 'down': [], 'left': [], 'right': [],
                            'right_idle': [], 'left_idle': [], 'up_idle': [], 'down_idle': [],
@@ -51,6 +52,7 @@ class Player(pygame.sprite.Sprite):
         self.image = self.animations[self.status.get()][self.frame_index]
         self.rect = self.image.get_rect(center=pos)
         self.z = LAYERS['main']
+        self.add(group)
 
         # movement attributes
         self.direction = pygame.math.Vector2()
@@ -92,6 +94,9 @@ class Player(pygame.sprite.Sprite):
         }
         self.money = 200
 
+        # called after every inventory or money change
+        self.inventory_listeners = []
+
         # interaction
         self.tree_sprites = tree_sprites
         self.interaction = interaction
@@ -100,7 +105,7 @@ class Player(pygame.sprite.Sprite):
         self.toggle_shop = toggle_shop
 
         # sound
-        self.watering_sound = pygame.mixer.Sound('../audio/water.mp3')
+        self.watering_sound = load_sound('../audio/water.mp3')
         self.watering_sound.set_volume(0.1)
 
     def use_tool(self):
@@ -121,7 +126,50 @@ class Player(pygame.sprite.Sprite):
     def use_seed(self):
         if self.seed_inventory[self.selected_seed] > 0:
             self.soil_layer.plant_seed(self.target_pos, self.selected_seed)
-            self.seed_inventory[self.selected_seed] -= 1
+            self.change_seeds(self.selected_seed, -1)
+
+    def change_items(self, item, amount):
+        self.item_inventory[item] += amount
+        self.inventory_changed()
+
+    def change_seeds(self, seed, amount):
+        self.seed_inventory[seed] += amount
+        self.inventory_changed()
+
+    def change_money(self, amount):
+        self.money += amount
+        self.inventory_changed()
+
+    def inventory_changed(self):
+        for listener in self.inventory_listeners:
+            listener()
+
+    def get_state(self):
+        return {
+            'pos': [self.pos.x, self.pos.y],
+            'item_inventory': dict(self.item_inventory),
+            'seed_inventory': dict(self.seed_inventory),
+            'money': self.money,
+            'selected_tool': self.selected_tool,
+            'selected_seed': self.selected_seed
+        }
+
+    def set_state(self, state):
+        self.pos.update(state['pos'])
+        self.rect.center = self.hitbox.center = round(self.pos.x), round(self.pos.y)
+        reposition(self)
+
+        self.item_inventory.update(state['item_inventory'])
+        self.seed_inventory.update(state['seed_inventory'])
+        self.money = state['money']
+        # a tool or seed the player does not have keeps the current selection
+        if state['selected_tool'] in self.tools:
+            while self.selected_tool != state['selected_tool']:
+                self.selected_tool = next(self.tools_cycle)
+        if state['selected_seed'] in self.seeds:
+            while self.selected_seed != state['selected_seed']:
+                self.selected_seed = next(self.seeds_cycle)
+        self.inventory_changed()
 
     def import_assets(self):
 
@@ -198,13 +246,9 @@ class Player(pygame.sprite.Sprite):
         if self.timers['tool use'].active:
             self.status.action = self.selected_tool
 
-    def update_timers(self):
-        for timer in self.timers.values():
-            timer.update()
-
     def collision(self, direction):
-        for sprite in self.collision_sprites.sprites():
-            if hasattr(sprite, 'hitbox') and sprite.hitbox is not None and sprite.hitbox.colliderect(self.hitbox):
+        for sprite in self.collision_sprites.nearby(self.hitbox):
+            if sprite.hitbox.colliderect(self.hitbox):
                 if direction == 'horizontal':
                     if self.direction.x > 0:  # moving right
                         self.hitbox.right = sprite.hitbox.left
@@ -238,6 +282,5 @@ class Player(pygame.sprite.Sprite):
     def update(self, dt):
         self.input()
         self.get_action()
-        self.update_timers()
         self.move(dt)
         self.animate(dt)
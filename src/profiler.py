@@ -0,0 +1,144 @@
+# coding=utf-8
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.totals[self.name] = self.totals.get(self.name, 0) + time.perf_counter() - self.start
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, history=600):
+        self.enabled = False
+        self.history = history
+
+        # per frame totals of the current frame, and ring buffers of finished frames in milliseconds
+        self.current = {}
+        self.samples = {}
+        self.frames = deque(maxlen=history)
+        self.frame_count = 0
+        self.frame_start = time.perf_counter()
+
+        # overlay
+        self.font = None
+        self.graph_size = (300, 80)
+        self.summary = []
+        self.summary_surfs = []
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current.clear()
+        self.frame_start = time.perf_counter()
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self.current, name)
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current['frame'] = now - self.frame_start
+        self.frame_start = now
+
+        frame_index = len(self.frames)
+        for name in self.current.keys() - self.samples.keys():
+            # scopes seen for the first time start with zeroes for the frames they missed
+            self.samples[name] = deque([0.0] * frame_index, maxlen=self.history)
+        for name, samples in self.samples.items():
+            samples.append(self.current.get(name, 0) * 1000)
+        self.frames.append(self.current['frame'] * 1000)
+        self.current = {}
+
+        self.frame_count += 1
+        if self.frame_count % 30 == 0:
+            self.summary = self.percentiles()
+            self.summary_surfs = None
+
+    def percentiles(self):
+        return [
+            (name, *np.percentile(samples, (50, 95, 99)))
+            for name, samples in sorted(self.samples.items())
+        ]
+
+    def dump(self, path):
+        if not self.frames:
+            return
+        names = sorted(self.samples)
+        if path.endswith('.json'):
+            report = {
+                'frames': len(self.frames),
+                'scopes': {
+                    name: {'p50': p50, 'p95': p95, 'p99': p99}
+                    for name, p50, p95, p99 in self.percentiles()
+                },
+                'samples': {name: list(self.samples[name]) for name in names}
+            }
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['frame'] + [f'{name} ms' for name in names])
+                for index, row in enumerate(zip(*(self.samples[name] for name in names))):
+                    writer.writerow([index] + [f'{value:.3f}' for value in row])
+
+    def display(self, surface):
+        if not self.enabled:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font('../font/LycheeSoda.ttf', 18)
+
+        # frame time graph, the line marks 60 fps
+        width, height = self.graph_size
+        graph_rect = pygame.Rect(surface.get_width() - width - 10, 10, width, height)
+        pygame.draw.rect(surface, 'black', graph_rect)
+        scale = height / 33.3
+        for x, frame_time in enumerate(list(self.frames)[-width:]):
+            bar_height = min(height, int(frame_time * scale))
+            color = 'green' if frame_time <= 16.7 else 'red'
+            pygame.draw.line(surface, color, (graph_rect.left + x, graph_rect.bottom), (graph_rect.left + x, graph_rect.bottom - bar_height))
+        line_y = graph_rect.bottom - int(16.7 * scale)
+        pygame.draw.line(surface, 'white', (graph_rect.left, line_y), (graph_rect.right, line_y))
+
+        # p50 / p95 / p99 per scope, re-rendered only when the summary changes
+        if self.summary_surfs is None:
+            self.summary_surfs = [
+                self.font.render(f'{name}: {p50:.2f} / {p95:.2f} / {p99:.2f} ms', False, 'white', 'black')
+                for name, p50, p95, p99 in self.summary
+            ]
+        top = graph_rect.bottom + 4
+        for text_surf in self.summary_surfs:
+            surface.blit(text_surf, (graph_rect.left, top))
+            top += text_surf.get_height()
+
+
+profiler = FrameProfiler()
@@ -0,0 +1,80 @@
+# coding=utf-8
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SAVE_VERSION = 1
+
+
+def write_save(path, state):
+    # farm and trees as arrays, the player as JSON metadata, all in one compressed npz file
+    arrays = dict(state['soil'])
+
+    trees = state['trees']
+    indices = sorted(trees)
+    arrays['tree_index'] = np.array(indices, dtype=np.int32)
+    arrays['tree_health'] = np.array([trees[index][0] for index in indices], dtype=np.int8)
+    arrays['tree_alive'] = np.array([trees[index][1] for index in indices], dtype=bool)
+    apples = [(index, x, y) for index in indices for x, y in trees[index][2]]
+    arrays['apples'] = np.array(apples, dtype=np.int32).reshape(-1, 3)
+
+    meta = {'version': SAVE_VERSION, 'player': state['player'], 'raining': state['raining']}
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    # written next to the old save first, so a failed write leaves the previous save in place
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        np.savez_compressed(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def read_save(path, map_size):
+    try:
+        with np.load(path, allow_pickle=False) as save:
+            arrays = {name: save[name] for name in save.files}
+        meta = json.loads(str(arrays['meta']))
+        if meta['version'] != SAVE_VERSION or arrays['soil'].shape != (map_size[1], map_size[0]):
+            return None
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+    trees = {
+        index: (health, alive, [])
+        for index, health, alive in zip(
+            arrays['tree_index'].tolist(), arrays['tree_health'].tolist(), arrays['tree_alive'].tolist()
+        )
+    }
+    for index, x, y in arrays['apples'].tolist():
+        trees[index][2].append((x, y))
+
+    return {
+        'player': meta['player'],
+        'soil': {name: array for name, array in arrays.items() if name == 'soil' or name.startswith('crop_')},
+        'trees': trees,
+        'raining': meta['raining']
+    }
+
+
+class Autosaver:
+    def __init__(self, path):
+        self.path = path
+
+        # a single thread, so saves reach the disk in the order they were made
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='autosave')
+
+    def save(self, state):
+        # state must be a snapshot that the game does not change afterwards
+        future = self.executor.submit(write_save, self.path, state)
+        future.add_done_callback(self.report)
+        return future
+
+    def report(self, future):
+        # a failed autosave must not stop the game, but it must not go unnoticed either
+        if not future.cancelled() and future.exception() is not None:
+            print(f'autosave to {self.path} failed: {future.exception()!r}', file=sys.stderr)
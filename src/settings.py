@@ -5,6 +5,12 @@ SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 TILE_SIZE = 64
 
+# main loop: fixed simulation step in seconds, render cap in fps (0 - uncapped) and vsync
+SIMULATION_STEP = 1 / 60
+MAX_FRAME_TIME = 0.25
+FRAME_RATE_CAP = 144
+VSYNC = False
+
 # overlay positions 
 OVERLAY_POSITIONS = {
     'tool': (40, SCREEN_HEIGHT - 15),
@@ -31,11 +37,37 @@ LAYERS = {
     'rain drops': 10
 }
 
+# layers whose sprites overlap and must be drawn in order of their rect.centery
+Y_SORTED_LAYERS = (LAYERS['ground plant'], LAYERS['main'], LAYERS['fruit'])
+
+# size of a spatial index cell in pixels, used for camera culling
+SPATIAL_CELL_SIZE = TILE_SIZE * 4
+
+# size of a broadphase cell in pixels, used for hitbox collisions
+COLLISION_CELL_SIZE = TILE_SIZE
+
+# size of the pre-baked surfaces static map layers are split into
+CHUNK_SIZE = 512
+
+# the world is streamed in chunks of CHUNK_SIZE pixels, prepared by this many background threads (0 - synchronous)
+STREAMING_WORKERS = 1
+
+# tile layers that make up the ground where the map has no pre-rendered ground image
+GROUND_LAYERS = ('Ground', 'Forest Grass', 'Outside Decoration', 'Hills')
+
 APPLE_POS = {
     'Small': [(18, 17), (30, 37), (12, 50), (30, 45), (20, 30), (30, 10)],
     'Large': [(30, 24), (60, 65), (50, 50), (16, 40), (45, 50), (42, 70)]
 }
 
+# soil tile variant for every neighbour mask (1 - top, 2 - right, 4 - bottom, 8 - left tilled)
+SOIL_TILE_TYPES = (
+    'o', 'b', 'l', 'bl',
+    't', 'tb', 'tl', 'tbr',
+    'r', 'br', 'lr', 'lrb',
+    'tr', 'tbl', 'lrt', 'x'
+)
+
 GROW_SPEED = {
     'corn': 1,
     'tomato': 0.7
@@ -55,4 +87,22 @@ PURCHASE_PRICES = {
 # chance for rain to appear on day reset in %
 RAIN_CHANCE = 30
 
+# rain particles, spawned per second on every million square pixels around the camera
+RAIN_PER_SECOND = 18
+RAIN_LIFETIME = (0.4, 0.5)  # in seconds
+RAIN_SPEED = (200, 250)
+RAIN_DIRECTION = (-2, 4)
+
 DAYTIME_TRANSITION_SPEED = 2
+
+# samples per second of the precomputed day/night colour curve
+SKY_CURVE_RESOLUTION = 10
+
+# sleep fade speed in brightness per second
+TRANSITION_SPEED = 128
+
+# frame profiler report written on exit when the F3 overlay was used, .csv or .json
+PROFILER_DUMP_PATH = '../profile.csv'
+
+# autosave written at the start of every day, None disables saving
+SAVE_PATH = '../save.dat'
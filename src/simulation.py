@@ -0,0 +1,51 @@
+# coding=utf-8
+import os
+import random
+
+import pygame
+
+from level import Level
+from settings import *
+from timer import clock, ui_clock
+
+
+def headless_display():
+    # SDL dummy drivers: no window and no audio device are needed
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    pygame.init()
+    return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+
+class Simulation:
+    def __init__(self, seed=0, dt=1 / 60, render=False, map_path='../data/map.tmx', tile_map=None):
+        self.dt = dt
+        self.render = render
+        self.frame = 0
+
+        random.seed(seed)
+        clock.reset()
+        ui_clock.reset()
+        self.screen = headless_display()
+
+        # chunks stream in synchronously, so every run loads them on the same frame
+        self.level = Level(map_path, streaming_workers=0, tile_map=tile_map)
+
+    def step(self, frames=1):
+        for _ in range(frames):
+            pygame.event.pump()
+            self.level.run(self.dt, render=self.render)
+            self.frame += 1
+
+    def screenshot(self, path):
+        pygame.image.save(self.screen, path)
+
+
+if __name__ == '__main__':
+    import time
+
+    simulation = Simulation()
+    start = time.perf_counter()
+    simulation.step(6000)
+    elapsed = time.perf_counter() - start
+    print(f'{simulation.frame} frames in {elapsed:.2f}s, {simulation.frame / elapsed:.0f} steps per second')
@@ -1,102 +1,130 @@
-import enum
-import itertools
 import random
 
-import pygame
+import numpy as np
 
 import settings
 
-from sprites import Generic
-from support import import_folder
-
-
-class Daytime(enum.Enum):
-    DAY = enum.auto()
-    NIGHT = enum.auto()
+from support import import_folder, reserve_arrays
 
 
 class Sky:
     def __init__(self):
-        self.display_surface = pygame.display.get_surface()
-        self.full_surf = pygame.Surface((settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT))
-        self.start_color = [255, 255, 255]
-        self.current_color = [255, 255, 255]
-        self.end_color = [38, 101, 189]
+        self.start_color = (255, 255, 255)
+        self.end_color = (38, 101, 189)
         self.day_transition_speed = settings.DAYTIME_TRANSITION_SPEED
-        self.day_time_states = itertools.cycle([Daytime.DAY, Daytime.NIGHT])
-        self.current_day_time_state = next(self.day_time_states)  # starts from 'day'
-
-    def display(self, dt):
-        for color_index, value in enumerate(self.current_color):
-            if self.current_day_time_state == Daytime.DAY and value > self.end_color[color_index]:
-                self.current_color[color_index] -= self.day_transition_speed * dt
-            elif self.current_day_time_state == Daytime.NIGHT and value < self.start_color[color_index]:
-                self.current_color[color_index] += self.day_transition_speed * dt
-
-        is_day_end = self.current_color > self.end_color
-        is_night_end = self.current_color < self.start_color
-
-        if is_day_end:
-            self.current_day_time_state = next(self.day_time_states)
-        if is_night_end:
-            self.current_day_time_state = next(self.day_time_states)
 
-        self.full_surf.fill(self.current_color)
-        self.display_surface.blit(self.full_surf, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        # time of day in seconds, 0 is the start of the day
+        self.time = 0
+        self.colors = self.create_color_curve()
+        self.cycle_length = len(self.colors) / settings.SKY_CURVE_RESOLUTION
 
+    def create_color_curve(self):
+        # during the day every channel fades towards the night colour, at night it fades back
+        start = np.array(self.start_color)
+        end = np.array(self.end_color)
+        half_cycle = (start - end).max() / self.day_transition_speed
+        time = np.arange(0, 2 * half_cycle, 1 / settings.SKY_CURVE_RESOLUTION)[:, np.newaxis]
 
-class Drop(Generic):
-    def __init__(self, surf, pos, moving, groups, z):
+        day = np.maximum(end, start - self.day_transition_speed * time)
+        night = np.minimum(start, end + self.day_transition_speed * (time - half_cycle))
+        colors = np.where(time < half_cycle, day, night).astype(int)
+        return [tuple(color) for color in colors.tolist()]
 
-        # general setup
-        super().__init__(pos, surf, groups, z)
-        self.lifetime = random.randint(400, 500)  # in milliseconds
-        self.start_time = pygame.time.get_ticks()
-
-        # moving
-        self.moving = moving
-        if self.moving:
-            self.pos = pygame.math.Vector2(self.rect.topleft)
-            self.direction = pygame.math.Vector2(-2, 4)
-            self.speed = random.randint(200, 250)
+    @property
+    def color(self):
+        return self.colors[int(self.time * settings.SKY_CURVE_RESOLUTION) % len(self.colors)]
 
     def update(self, dt):
-        # movement
-        if self.moving:
-            self.pos += self.direction * self.speed * dt
-            self.rect.topleft = (round(self.pos.x), round(self.pos.y))
+        self.time = (self.time + dt) % self.cycle_length
+
+
+class RainParticles:
+    def __init__(self, surfs, lifetime, rng, speed=None, capacity=256):
+        self.surfs = surfs
+        self.lifetime = lifetime
+        self.speed = speed
+        self.rng = rng
+        self.margin_w = max(surf.get_width() for surf in surfs)
+        self.margin_h = max(surf.get_height() for surf in surfs)
+
+        # particle pool, the first `count` entries are alive
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.time_left = np.zeros(capacity)
+        self.frame = np.zeros(capacity, dtype=np.intp)
+        self.step = 0
+
+    def reserve(self, capacity):
+        reserve_arrays(self, ('pos', 'velocity', 'time_left', 'frame'), self.count, capacity)
+
+    def spawn(self, amount, topleft, bottomright):
+        self.reserve(self.count + amount)
+        new = slice(self.count, self.count + amount)
+        self.pos[new] = self.rng.uniform(topleft, bottomright, (amount, 2))
+        self.time_left[new] = self.rng.uniform(*self.lifetime, amount)
+        self.frame[new] = self.rng.integers(len(self.surfs), size=amount)
+        if self.speed:
+            self.velocity[new] = np.multiply(settings.RAIN_DIRECTION, self.rng.uniform(*self.speed, (amount, 1)))
+        self.count += amount
 
-        # timer
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.lifetime:
-            self.kill()
+    def update(self, dt):
+        self.step = dt
+        count = self.count
+        self.time_left[:count] -= dt
+        if self.speed:
+            self.pos[:count] += self.velocity[:count] * dt
+
+        # compact the pool so the living particles stay at the front
+        alive = self.time_left[:count] > 0
+        if not alive.all():
+            self.count = int(np.count_nonzero(alive))
+            for array in (self.pos, self.velocity, self.time_left, self.frame):
+                array[:self.count] = array[:count][alive]
+
+    def render(self, view_rect, alpha=1):
+        pos = self.pos[:self.count]
+        if self.speed and alpha < 1:
+            # moving particles are drawn between the last two simulation steps
+            pos = pos + self.velocity[:self.count] * ((alpha - 1) * self.step)
+        screen_pos = np.rint(pos - view_rect.topleft).astype(int)
+        x, y = screen_pos[:, 0], screen_pos[:, 1]
+        visible = (x > -self.margin_w) & (x < view_rect.width) & (y > -self.margin_h) & (y < view_rect.height)
+        surfs = self.surfs
+        return [(surfs[frame], pos) for frame, pos in zip(self.frame[:self.count][visible].tolist(), screen_pos[visible].tolist())]
 
 
 class Rain:
-    def __init__(self, all_sprites):
-        self.all_sprites = all_sprites
-        self.rain_drops = import_folder('../graphics/rain/drops')
-        self.rain_floor = import_folder('../graphics/rain/floor')
-        self.floor_w, self.floor_h = pygame.image.load('../graphics/world/ground.png').get_size()
-
-    def create_floor(self):
-        Drop(
-            surf=random.choice(self.rain_floor),
-            pos=(random.randint(0, self.floor_w), random.randint(0, self.floor_h)),
-            moving=False,
-            groups=self.all_sprites,
-            z=settings.LAYERS['rain floor']
+    def __init__(self, all_sprites, world_size):
+        # seeded from the random module so a seeded game gets the same rain
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        self.floor = RainParticles(import_folder('../graphics/rain/floor'), settings.RAIN_LIFETIME, self.rng)
+        self.drops = RainParticles(
+            import_folder('../graphics/rain/drops'), settings.RAIN_LIFETIME, self.rng, speed=settings.RAIN_SPEED
         )
-
-    def create_drops(self):
-        Drop(
-            surf=random.choice(self.rain_drops),
-            pos=(random.randint(0, self.floor_w), random.randint(0, self.floor_h)),
-            moving=True,
-            groups=self.all_sprites,
-            z=settings.LAYERS['rain drops']
-        )
-
-    def update(self):
-        self.create_floor()
-        self.create_drops()
+        self.world_size = world_size
+        self.rate = settings.RAIN_PER_SECOND / 1_000_000
+        self.spawn_budget = 0
+
+        all_sprites.add_renderer(settings.LAYERS['rain floor'], self.floor.render)
+        all_sprites.add_renderer(settings.LAYERS['rain drops'], self.drops.render)
+
+    def spawn_area(self, center):
+        # rain only falls around the camera, with a chunk of margin for drops falling into view
+        half_size = np.array((settings.SCREEN_WIDTH / 2, settings.SCREEN_HEIGHT / 2)) + settings.CHUNK_SIZE
+        topleft = np.maximum(np.subtract(center, half_size), 0)
+        bottomright = np.minimum(np.add(center, half_size), self.world_size)
+        return topleft, np.maximum(bottomright, topleft)
+
+    def update(self, dt, center, spawn=True):
+        if spawn:
+            topleft, bottomright = self.spawn_area(center)
+            self.spawn_budget += self.rate * np.prod(bottomright - topleft) * dt
+            amount = int(self.spawn_budget)
+            self.spawn_budget -= amount
+            if amount:
+                self.floor.spawn(amount, topleft, bottomright)
+                self.drops.spawn(amount, topleft, bottomright)
+
+        self.floor.update(dt)
+        self.drops.update(dt)
@@ -1,74 +1,218 @@
 import random
 
+import numpy as np
 import pygame
-from pytmx import load_pygame
 
 import settings
-from support import import_folder_dict, import_folder
+from enumerations import SoilFlag
+from spatial import reposition
+from support import import_folder_dict, import_folder, load_sound, reserve_arrays
 
 
 class SoilTile(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups):
-        super().__init__(groups)
+        super().__init__()
         self.image = surf
         self.rect = self.image.get_rect(topleft=pos)
         self.z = settings.LAYERS['soil']
+        self.add(groups)
 
 
 class WaterTile(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups):
-        super().__init__(groups)
+        super().__init__()
         self.image = surf
         self.rect = self.image.get_rect(topleft=pos)
         self.z = settings.LAYERS['soil water']
+        self.add(groups)
 
 
 class Plant(pygame.sprite.Sprite):
-    def __init__(self, plant_type, groups, soil, check_watered):
-        super().__init__(groups)
+    # the crop's growth state lives in SoilLayer.crops, the sprite only shows its current stage
+    def __init__(self, plant_type, tile, groups, all_sprites):
+        super().__init__()
 
         # setup
         self.plant_type = plant_type
+        self.tile = tile
+        self.all_sprites = all_sprites
         self.frames = import_folder(f'../graphics/fruit/{plant_type}')
-        self.soil = soil
-        self.check_watered = check_watered
-        self.harvestable = None
+        self.harvestable = False
         self.hitbox = None
 
-        #  plant growing
-        self.age = 0
-        self.max_age = len(self.frames) - 1
-        self.grow_speed = settings.GROW_SPEED[plant_type]
-
         # sprite setup
-        self.image = self.frames[self.age]
         self.y_offset = -16 if plant_type == 'corn' else -8
-        self.rect = self.image.get_rect(midbottom=soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
+        self.stage = 0
+        self.image = self.frames[self.stage]
+        self.rect = self.get_rect()
         self.z = settings.LAYERS['ground plant']
-
-    def grow(self):
-        if self.check_watered(self.rect.center):
-            self.age += self.grow_speed
-
-            if int(self.age) > 0:
-                self.z = settings.LAYERS['main']
-                self.hitbox = self.rect.copy().inflate(-26, -self.rect.height * 0.4)
-
-            if self.age >= self.max_age:
-                self.age = self.max_age
-                self.harvestable = True
-
-            self.image = self.frames[int(self.age)]
-            self.rect = self.image.get_rect(
-                midbottom=self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset)
-            )
+        self.add(groups)
+
+    def get_rect(self):
+        x, y = self.tile
+        bottom = ((x + 0.5) * settings.TILE_SIZE, (y + 1) * settings.TILE_SIZE + self.y_offset)
+        return self.image.get_rect(midbottom=bottom)
+
+    def show_stage(self, stage, harvestable):
+        self.stage = stage
+        self.harvestable = harvestable
+        self.image = self.frames[stage]
+        self.rect = self.get_rect()
+
+        if stage > 0:
+            if self.z != settings.LAYERS['main']:
+                self.all_sprites.change_layer(self, settings.LAYERS['main'])
+            self.hitbox = self.rect.copy().inflate(-26, -self.rect.height * 0.4)
+        reposition(self)
+
+
+class CropStore:
+    # growth state of every crop in flat arrays, slots [0, count) are in use
+    def __init__(self, width, height, capacity=64):
+        self.slots = np.full((height, width), -1, dtype=np.int32)
+        self.count = 0
+        self.tiles = np.zeros((capacity, 2), dtype=np.intp)
+        self.kinds = np.zeros(capacity, dtype=np.uint8)
+        self.age = np.zeros(capacity)
+        self.max_age = np.zeros(capacity)
+        self.grow_speed = np.zeros(capacity)
+        self.harvestable = np.zeros(capacity, dtype=bool)
+
+    def reserve(self, capacity):
+        reserve_arrays(self, ('tiles', 'kinds', 'age', 'max_age', 'grow_speed', 'harvestable'), self.count, capacity)
+
+    def add(self, x, y, kind, max_age, grow_speed):
+        self.reserve(self.count + 1)
+        slot = self.count
+        self.tiles[slot] = x, y
+        self.kinds[slot] = kind
+        self.age[slot] = 0
+        self.max_age[slot] = max_age
+        self.grow_speed[slot] = grow_speed
+        self.harvestable[slot] = False
+        self.slots[y, x] = slot
+        self.count += 1
+
+    def get_state(self):
+        count = self.count
+        return {
+            'crop_tiles': self.tiles[:count].copy(),
+            'crop_kinds': self.kinds[:count].copy(),
+            'crop_age': self.age[:count].copy(),
+            'crop_max_age': self.max_age[:count].copy(),
+            'crop_grow_speed': self.grow_speed[:count].copy(),
+            'crop_harvestable': self.harvestable[:count].copy()
+        }
+
+    def set_state(self, state):
+        count = len(state['crop_tiles'])
+        self.reserve(count)
+        self.count = count
+        self.tiles[:count] = state['crop_tiles']
+        self.kinds[:count] = state['crop_kinds']
+        self.age[:count] = state['crop_age']
+        self.max_age[:count] = state['crop_max_age']
+        self.grow_speed[:count] = state['crop_grow_speed']
+        self.harvestable[:count] = state['crop_harvestable']
+        self.slots.fill(-1)
+        self.slots[self.tiles[:count, 1], self.tiles[:count, 0]] = np.arange(count)
+
+    def remove(self, x, y):
+        # the last crop moves into the freed slot
+        slot = self.slots[y, x]
+        last = self.count - 1
+        for array in (self.tiles, self.kinds, self.age, self.max_age, self.grow_speed, self.harvestable):
+            array[slot] = array[last]
+        self.slots[y, x] = -1
+        if slot != last:
+            self.slots[self.tiles[slot, 1], self.tiles[slot, 0]] = slot
+        self.count = last
+
+    def grow(self, watered):
+        # one night for every crop on a watered tile, returns the slots whose stage or harvest state changed
+        count = self.count
+        x, y = self.tiles[:count, 0], self.tiles[:count, 1]
+        growing = watered[y, x]
+        age, max_age = self.age[:count], self.max_age[:count]
+
+        stage = age.astype(np.intp)
+        age += np.where(growing, self.grow_speed[:count], 0)
+        np.minimum(age, max_age, out=age)
+        ripe = growing & (age >= max_age) & ~self.harvestable[:count]
+        self.harvestable[:count] |= ripe
+        return np.nonzero((age.astype(np.intp) != stage) | ripe)[0]
+
+
+class SoilGrid:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = np.zeros((height, width), dtype=np.uint8)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def has(self, x, y, flag):
+        return self.in_bounds(x, y) and bool(self.cells[y, x] & flag)
+
+    def set(self, x, y, flag):
+        self.cells[y, x] |= np.uint8(flag)
+
+    def clear(self, x, y, flag):
+        self.cells[y, x] &= np.uint8(~flag & 0xFF)
+
+    def clear_all(self, flag):
+        self.cells &= np.uint8(~flag & 0xFF)
+
+    def set_all(self, flag, where):
+        # set flag on every cell that has all of `where` and does not have flag yet, return the changed tiles
+        changed = (self.cells & (where | flag)) == where
+        self.cells[changed] |= np.uint8(flag)
+        return self.tiles_from_mask(changed)
+
+    def tiles(self, flag):
+        return self.tiles_from_mask((self.cells & flag) != 0)
+
+    @staticmethod
+    def tiles_from_mask(mask):
+        rows, cols = np.nonzero(mask)
+        return list(zip(cols.tolist(), rows.tolist()))
+
+    def neighbour_mask(self, x, y):
+        # bits: 1 - top, 2 - right, 4 - bottom, 8 - left
+        return (
+            self.is_tilled(x, y - 1)
+            | self.is_tilled(x + 1, y) << 1
+            | self.is_tilled(x, y + 1) << 2
+            | self.is_tilled(x - 1, y) << 3
+        )
+
+    def is_farmable(self, x, y):
+        return self.has(x, y, SoilFlag.FARMABLE)
+
+    def is_tilled(self, x, y):
+        return self.has(x, y, SoilFlag.TILLED)
+
+    def is_watered(self, x, y):
+        return self.has(x, y, SoilFlag.WATERED)
+
+    def is_planted(self, x, y):
+        return self.has(x, y, SoilFlag.PLANTED)
 
 
 class SoilLayer:
-    def __init__(self, all_sprites, collision_sprites):
+    def __init__(self, all_sprites, collision_sprites, tmx_data):
         self.raining = None
-        self.hit_rects = None
         self.grid = None
+        self.crops = None
+
+        # tiles of the streamed in chunks, only these have sprites
+        self.loaded = None
+
+        # tile index, (x, y) -> sprite
+        self.soil_tiles = {}
+        self.water_tiles = {}
+        self.plants = {}
 
         # sprite groups
         self.all_sprites = all_sprites
@@ -76,171 +220,175 @@ class SoilLayer:
         self.soil_sprites = pygame.sprite.Group()
         self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
+        self.crop_types = list(settings.GROW_SPEED)
 
         # graphics
         self.soil_surfs = import_folder_dict('../graphics/soil')
         self.water_surfs = import_folder('../graphics/soil_water')
 
-        self.create_soil_grid()
-        self.create_hit_rects()
+        self.create_soil_grid(tmx_data)
 
         # sounds
-        self.hoe_sound = pygame.mixer.Sound('../audio/hoe.wav')
+        self.hoe_sound = load_sound('../audio/hoe.wav')
         self.hoe_sound.set_volume(0.2)
 
-        self.plant_sound = pygame.mixer.Sound('../audio/plant.wav')
+        self.plant_sound = load_sound('../audio/plant.wav')
         self.plant_sound.set_volume(0.1)
 
-    def create_soil_grid(self):
-        ground = pygame.image.load('../graphics/world/ground.png')
-        v_tiles, h_tiles = ground.get_width() // settings.TILE_SIZE, ground.get_height() // settings.TILE_SIZE
-
-        self.grid = [[[] for col in range(h_tiles)] for row in range(v_tiles)]
-        for x, y, _ in load_pygame('../data/map.tmx').get_layer_by_name('Farmable').tiles():
-            self.grid[y][x].append('F')
-
-    def create_hit_rects(self):
-        self.hit_rects = []
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * settings.TILE_SIZE
-                    y = index_row * settings.TILE_SIZE
-                    rect = pygame.Rect(x, y, settings.TILE_SIZE, settings.TILE_SIZE)
-                    self.hit_rects.append(rect)
+    def create_soil_grid(self, tmx_data):
+        self.grid = SoilGrid(tmx_data.width, tmx_data.height)
+        self.crops = CropStore(tmx_data.width, tmx_data.height)
+        self.loaded = np.zeros((tmx_data.height, tmx_data.width), dtype=bool)
+        for x, y, _ in tmx_data.get_layer_by_name('Farmable').tiles():
+            self.grid.set(x, y, SoilFlag.FARMABLE)
+
+    @staticmethod
+    def get_tile(pos):
+        return int(pos[0] // settings.TILE_SIZE), int(pos[1] // settings.TILE_SIZE)
+
+    def get_state(self):
+        return {'soil': self.grid.cells.copy(), **self.crops.get_state()}
+
+    def set_state(self, state):
+        # only valid before any area is loaded, the sprites are created from this state
+        self.grid.cells[:] = state['soil']
+        self.crops.set_state(state)
+
+    def is_loaded(self, x, y):
+        return self.grid.in_bounds(x, y) and bool(self.loaded[y, x])
+
+    def load_area(self, left, top, width, height):
+        # create the sprites of a streamed in area from the farm state
+        self.loaded[top:top + height, left:left + width] = True
+        cells = self.grid.cells[top:top + height, left:left + width]
+        for x, y in self.grid.tiles_from_mask((cells & SoilFlag.TILLED) != 0):
+            self.update_soil_tiles(x + left, y + top, neighbours=False)
+        for x, y in self.grid.tiles_from_mask((cells & SoilFlag.WATERED) != 0):
+            self.create_water_tile(x + left, y + top)
+
+        crops = self.crops
+        slots = crops.slots[top:top + height, left:left + width]
+        for slot in slots[slots >= 0].tolist():
+            x, y = crops.tiles[slot].tolist()
+            plant = self.create_plant(x, y, self.crop_types[crops.kinds[slot]])
+            if crops.age[slot] >= 1 or crops.harvestable[slot]:
+                plant.show_stage(int(crops.age[slot]), bool(crops.harvestable[slot]))
+
+    def unload_area(self, left, top, width, height):
+        # the farm state stays in the grid and crop store, only the sprites go
+        self.loaded[top:top + height, left:left + width] = False
+        cells = self.grid.cells[top:top + height, left:left + width]
+        for x, y in self.grid.tiles_from_mask(cells != 0):
+            for tiles in (self.soil_tiles, self.water_tiles, self.plants):
+                sprite = tiles.pop((x + left, y + top), None)
+                if sprite:
+                    sprite.kill()
 
     def get_hit(self, point):
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):
-                self.hoe_sound.play()
-                x = rect.x // settings.TILE_SIZE
-                y = rect.y // settings.TILE_SIZE
-
-                if 'F' in self.grid[y][x]:
-                    self.grid[y][x].append('X')
-                    self.create_soil_tiles()
-                    if self.raining:
-                        self.water(point)
+        x, y = self.get_tile(point)
+        if self.grid.is_farmable(x, y):
+            self.hoe_sound.play()
+
+            if not self.grid.is_tilled(x, y):
+                self.grid.set(x, y, SoilFlag.TILLED)
+                self.update_soil_tiles(x, y)
+                if self.raining:
+                    self.water(point)
 
     def water(self, target_pos):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
-                # add 'W' entry to the soil grid
-                x = soil_sprite.rect.x // settings.TILE_SIZE
-                y = soil_sprite.rect.y // settings.TILE_SIZE
-                self.grid[y][x].append('W')
+        x, y = self.get_tile(target_pos)
+        if self.grid.is_tilled(x, y) and not self.grid.is_watered(x, y):
+            # mark the tile as watered in the soil grid
+            self.grid.set(x, y, SoilFlag.WATERED)
 
-                # create a water sprite
-                random_water_surf = random.choice(self.water_surfs)
-                WaterTile(soil_sprite.rect.topleft, random_water_surf, [self.all_sprites, self.water_sprites])
+            # create a water sprite
+            self.create_water_tile(x, y)
 
     def water_all(self):
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell and 'W' not in cell:
-                    cell.append('W')
-                    x = index_col * settings.TILE_SIZE
-                    y = index_row * settings.TILE_SIZE
-                    random_water_surf = random.choice(self.water_surfs)
-                    WaterTile((x, y), random_water_surf, [self.all_sprites, self.water_sprites])
+        for x, y in self.grid.set_all(SoilFlag.WATERED, where=SoilFlag.TILLED):
+            self.create_water_tile(x, y)
+
+    def create_water_tile(self, x, y):
+        if not self.is_loaded(x, y):
+            return
+        random_water_surf = random.choice(self.water_surfs)
+        self.water_tiles[x, y] = WaterTile(
+            (x * settings.TILE_SIZE, y * settings.TILE_SIZE),
+            random_water_surf,
+            [self.all_sprites, self.water_sprites]
+        )
 
     def remove_water(self):
         # destroy all water sprites
         for sprite in self.water_sprites.sprites():
             sprite.kill()
+        self.water_tiles.clear()
 
         # clean up the grid
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')
-
-    def check_watered(self, pos):
-        x = pos[0] // settings.TILE_SIZE
-        y = pos[1] // settings.TILE_SIZE
-        cell = self.grid[y][x]
-        is_watered = 'W' in cell
-        return is_watered
+        self.grid.clear_all(SoilFlag.WATERED)
 
     def plant_seed(self, target_pos, seed):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
-
-                x = soil_sprite.rect.x // settings.TILE_SIZE
-                y = soil_sprite.rect.y // settings.TILE_SIZE
-
-                if 'P' not in self.grid[y][x]:
-                    self.plant_sound.play()
-                    self.grid[y][x].append('P')
-                    Plant(
-                        plant_type=seed,
-                        groups=[self.all_sprites, self.plant_sprites, self.collision_sprites],
-                        soil=soil_sprite,
-                        check_watered=self.check_watered
-                    )
+        x, y = self.get_tile(target_pos)
+        if self.grid.is_tilled(x, y) and not self.grid.is_planted(x, y):
+            self.plant_sound.play()
+            self.grid.set(x, y, SoilFlag.PLANTED)
+            max_age = len(import_folder(f'../graphics/fruit/{seed}')) - 1
+            self.crops.add(x, y, self.crop_types.index(seed), max_age, settings.GROW_SPEED[seed])
+            if self.is_loaded(x, y):
+                self.create_plant(x, y, seed)
+
+    def create_plant(self, x, y, seed):
+        self.plants[x, y] = Plant(
+            plant_type=seed,
+            tile=(x, y),
+            groups=[self.all_sprites, self.plant_sprites, self.collision_sprites],
+            all_sprites=self.all_sprites
+        )
+        return self.plants[x, y]
+
+    def remove_plant(self, plant):
+        x, y = plant.tile
+        plant.kill()
+        del self.plants[x, y]
+        self.crops.remove(x, y)
+        self.grid.clear(x, y, SoilFlag.PLANTED)
 
     def update_plants(self):
-        for plant in self.plant_sprites.sprites():
-            plant.grow()
-
-    def create_soil_tiles(self):
-        self.soil_sprites.empty()
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:
-
-                    # tile options
-                    top = 'X' in self.grid[index_row - 1][index_col]
-                    bottom = 'X' in self.grid[index_row + 1][index_col]
-                    left = 'X' in row[index_col - 1]
-                    right = 'X' in row[index_col + 1]
-
-                    tile_type = 'o'
-
-                    # all sides
-                    if all((top, bottom, left, right)):
-                        tile_type = 'x'
-
-                    # horizontal tiles only
-                    if left and not any((top, right, bottom)):
-                        tile_type = 'r'
-                    if right and not any((top, left, bottom)):
-                        tile_type = 'l'
-                    if right and left and not any((top, bottom)):
-                        tile_type = 'lr'
-
-                    # vertical only
-                    if top and not any((right, left, bottom)):
-                        tile_type = 'b'
-                    if bottom and not any((right, left, top)):
-                        tile_type = 't'
-                    if bottom and top and not any((right, left)):
-                        tile_type = 'tb'
-
-                    # corners
-                    if left and bottom and not any((top, right)):
-                        tile_type = 'tr'
-                    if left and top and not any((bottom, right)):
-                        tile_type = 'br'
-                    if right and bottom and not any((top, left)):
-                        tile_type = 'tl'
-                    if right and top and not any((bottom, left)):
-                        tile_type = 'bl'
-
-                    # T shapes
-                    if all((top, bottom, right)) and not left:
-                        tile_type = 'tbr'
-                    if all((top, bottom, left)) and not right:
-                        tile_type = 'tbl'
-                    if all((left, right, bottom)) and not top:
-                        tile_type = 'lrt'
-                    if all((left, right, top)) and not bottom:
-                        tile_type = 'lrb'
-
-                    # FIXME: add more logic to fix not ideal tiling
-
-                    SoilTile(
-                        pos=(index_col * settings.TILE_SIZE, index_row * settings.TILE_SIZE),
-                        surf=self.soil_surfs[tile_type],
+        watered = (self.grid.cells & SoilFlag.WATERED) != 0
+        crops = self.crops
+        changed = crops.grow(watered)
+
+        # only crops in loaded chunks have a sprite to refresh
+        tiles = crops.tiles[changed]
+        changed = changed[self.loaded[tiles[:, 1], tiles[:, 0]]]
+        for (x, y), age, harvestable in zip(
+            crops.tiles[changed].tolist(), crops.age[changed].astype(np.intp).tolist(), crops.harvestable[changed].tolist()
+        ):
+            self.plants[x, y].show_stage(age, harvestable)
+
+    def harvestable_plants(self, rect):
+        # plants reach at most one tile beyond their own, so only the tiles around rect are checked
+        left, top = self.get_tile(rect.topleft)
+        right, bottom = self.get_tile(rect.bottomright)
+        slots = self.crops.slots[max(top - 1, 0):bottom + 2, max(left - 1, 0):right + 2]
+        slots = slots[slots >= 0]
+        for slot in slots[self.crops.harvestable[slots]].tolist():
+            plant = self.plants.get(tuple(self.crops.tiles[slot].tolist()))
+            if plant:
+                yield plant
+
+    def update_soil_tiles(self, x, y, neighbours=True):
+        # only the changed tile and its direct neighbours can pick a different variant
+        tiles = ((x, y), (x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)) if neighbours else ((x, y),)
+        for tile_x, tile_y in tiles:
+            if self.grid.is_tilled(tile_x, tile_y) and self.is_loaded(tile_x, tile_y):
+                surf = self.soil_surfs[settings.SOIL_TILE_TYPES[self.grid.neighbour_mask(tile_x, tile_y)]]
+                soil_tile = self.soil_tiles.get((tile_x, tile_y))
+                if soil_tile:
+                    soil_tile.image = surf
+                else:
+                    self.soil_tiles[tile_x, tile_y] = SoilTile(
+                        pos=(tile_x * settings.TILE_SIZE, tile_y * settings.TILE_SIZE),
+                        surf=surf,
                         groups=[self.all_sprites, self.soil_sprites]
                     )
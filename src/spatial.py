@@ -0,0 +1,95 @@
+# coding=utf-8
+import pygame
+
+
+class SpatialGrid:
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, item):
+        return item in self.bounds
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        left = rect.left // size
+        top = rect.top // size
+        right = max(left, (rect.right - 1) // size)
+        bottom = max(top, (rect.bottom - 1) // size)
+        return left, top, right, bottom
+
+    def insert(self, item, rect):
+        bounds = self.cell_range(rect)
+        self.bounds[item] = bounds
+        left, top, right, bottom = bounds
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                self.cells.setdefault((x, y), {})[item] = None
+
+    def remove(self, item):
+        left, top, right, bottom = self.bounds.pop(item)
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                cell = self.cells[x, y]
+                del cell[item]
+                if not cell:
+                    del self.cells[x, y]
+
+    def move(self, item, rect):
+        # returns whether the item changed cells
+        if self.bounds[item] == self.cell_range(rect):
+            return False
+        self.remove(item)
+        self.insert(item, rect)
+        return True
+
+    def query(self, rect):
+        left, top, right, bottom = self.cell_range(rect)
+        cells = self.cells
+        found = {}
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                cell = cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return found
+
+
+class CollisionGroup(pygame.sprite.Group):
+    def __init__(self, cell_size):
+        super().__init__()
+        self.spatial_index = SpatialGrid(cell_size)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.reposition(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if sprite in self.spatial_index:
+            self.spatial_index.remove(sprite)
+
+    def reposition(self, sprite):
+        hitbox = getattr(sprite, 'hitbox', None)
+        if hitbox is None:
+            if sprite in self.spatial_index:
+                self.spatial_index.remove(sprite)
+        elif sprite in self.spatial_index:
+            self.spatial_index.move(sprite, hitbox)
+        else:
+            self.spatial_index.insert(sprite, hitbox)
+
+    def nearby(self, rect):
+        return list(self.spatial_index.query(rect))
+
+
+def reposition(sprite):
+    # re-index a sprite whose rect or hitbox changed in every group that keeps a spatial index
+    for group in sprite.groups():
+        if hasattr(group, 'reposition'):
+            group.reposition(sprite)
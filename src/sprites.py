@@ -3,16 +3,22 @@ import random
 
 import pygame
 from settings import *
-from timer import Timer
+from spatial import reposition
+from support import load_image, load_sound
+from timer import clock
 
 
 class Generic(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups, z=LAYERS['main']):
-        super().__init__(groups)
+        super().__init__()
         self.image = surf
         self.rect = self.image.get_rect(topleft=pos)
         self.z = z
-        self.hitbox = self.rect.copy().inflate(-self.rect.width * 0.2, -self.rect.height * 0.75)
+        self.hitbox = self.create_hitbox()
+        self.add(groups)
+
+    def create_hitbox(self):
+        return self.rect.copy().inflate(-self.rect.width * 0.2, -self.rect.height * 0.75)
 
 
 class Interaction(Generic):
@@ -22,41 +28,15 @@ class Interaction(Generic):
         self.name = name
 
 
-class Water(Generic):
-    def __init__(self, pos, frames, groups):
-        # animation setup
-        self.frames = frames
-        self.frame_index = 0
-
-        # sprite setup
-        super().__init__(
-            pos=pos,
-            surf=self.frames[self.frame_index],
-            groups=groups,
-            z=LAYERS['water']
-        )
-
-    def animate(self, dt):
-        self.frame_index += 5 * dt
-        if self.frame_index >= len(self.frames):
-            self.frame_index = 0
-        self.image = self.frames[int(self.frame_index)]
-
-    def update(self, dt):
-        self.animate(dt)
-
-
 class WildFlower(Generic):
-    def __init__(self, pos, surf, groups):
-        super().__init__(pos, surf, groups)
-        self.hitbox = self.rect.copy().inflate(-20, -self.rect.height)
+    def create_hitbox(self):
+        return self.rect.copy().inflate(-20, -self.rect.height)
 
 
 class Particle(Generic):
     def __init__(self, pos, surf, groups, z, duration=200):
         super().__init__(pos, surf, groups, z)
-        self.start_time = pygame.time.get_ticks()
-        self.duration = duration
+        clock.schedule(duration, self.kill)
 
         # white surface
         mask_surf = pygame.mask.from_surface(self.image)
@@ -64,24 +44,21 @@ class Particle(Generic):
         new_surf.set_colorkey((0, 0, 0))
         self.image = new_surf
 
-    def update(self, dt):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time > self.duration:
-            self.kill()
-
 
 class Tree(Generic):
     MAX_HEALTH = 5
-    def __init__(self, pos, surf, groups, name, player_add):
+    def __init__(self, pos, surf, groups, all_sprites, name, player_add):
         super().__init__(pos, surf, groups)
+        self.all_sprites = all_sprites
+        self.name = name
 
         self.health = Tree.MAX_HEALTH
         self.alive = True
         self.tree_surf = surf
-        self.stump_surf = pygame.image.load(f'../graphics/stumps/{"small" if name == "Small" else "large"}.png')
+        self.stump_surf = load_image(f'../graphics/stumps/{"small" if name == "Small" else "large"}.png')
 
         # apples
-        self.apple_surf = pygame.image.load('../graphics/fruit/apple.png')
+        self.apple_surf = load_image('../graphics/fruit/apple.png')
         self.apple_pos = APPLE_POS[name]
         self.apple_sprites = pygame.sprite.Group()
         self.create_fruit()
@@ -89,11 +66,11 @@ class Tree(Generic):
         self.player_add = player_add
 
         # sounds
-        self.axe_sound = pygame.mixer.Sound('../audio/axe.mp3')
+        self.axe_sound = load_sound('../audio/axe.mp3')
 
     def damage(self):
-        # damaging the tree
-        self.health -= 1
+        # damaging the tree, stumps can still be hit so health stops at 0
+        self.health = max(self.health - 1, 0)
 
         # play sound
         self.axe_sound.play()
@@ -104,7 +81,7 @@ class Tree(Generic):
             Particle(
                 pos=random_apple.rect.topleft,
                 surf=random_apple.image,
-                groups=self.groups()[0],
+                groups=self.all_sprites,
                 z=LAYERS['fruit']
             )
             self.player_add('apple')
@@ -115,16 +92,20 @@ class Tree(Generic):
             Particle(
                 pos=self.rect.topleft,
                 surf=self.image,
-                groups=self.groups()[0],
+                groups=self.all_sprites,
                 z=LAYERS['fruit'],
                 duration=350
             )
-            self.image = self.stump_surf
-            self.rect = self.image.get_rect(midbottom=self.rect.midbottom)
-            self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
-            self.alive = False
+            self.cut_down()
             self.player_add('wood')
 
+    def cut_down(self):
+        self.image = self.stump_surf
+        self.rect = self.image.get_rect(midbottom=self.rect.midbottom)
+        self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
+        reposition(self)
+        self.alive = False
+
     def update(self, dt):
         if self.alive:
             self.check_death()
@@ -137,14 +118,39 @@ class Tree(Generic):
                 Generic(
                     pos=(x, y),
                     surf=self.apple_surf,
-                    groups=[self.apple_sprites, self.groups()[0]],
+                    groups=[self.apple_sprites, self.all_sprites],
                     z=LAYERS['fruit']
                 )
 
+    def get_state(self):
+        apples = [(apple.rect.left - self.rect.left, apple.rect.top - self.rect.top) for apple in self.apple_sprites]
+        return self.health, self.alive, apples
+
+    def set_state(self, state):
+        health, alive, apples = state
+        self.health = health
+        if not alive:
+            self.cut_down()
+        for apple in self.apple_sprites.sprites():
+            apple.kill()
+        for pos in apples:
+            Generic(
+                pos=(self.rect.left + pos[0], self.rect.top + pos[1]),
+                surf=self.apple_surf,
+                groups=[self.apple_sprites, self.all_sprites],
+                z=LAYERS['fruit']
+            )
+
+    def unload(self):
+        for apple in self.apple_sprites.sprites():
+            apple.kill()
+        self.kill()
+
     def restore(self):
         self.health = Tree.MAX_HEALTH
         self.image = self.tree_surf
         self.rect = self.image.get_rect(midbottom=self.rect.midbottom)
-        self.hitbox = self.rect.copy().inflate(-self.rect.width * 0.2, -self.rect.height * 0.75)
+        self.hitbox = self.create_hitbox()
+        reposition(self)
         self.alive = True
 
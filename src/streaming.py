@@ -0,0 +1,65 @@
+# coding=utf-8
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from settings import *
+
+
+class WorldStreamer:
+    def __init__(self, world_size, prepare, load, unload, workers=STREAMING_WORKERS, chunk_size=CHUNK_SIZE):
+        # prepare(chunk) runs on a worker thread and must not touch sprite groups or the display,
+        # load(chunk, prepared) and unload(chunk) run on the main thread
+        self.prepare = prepare
+        self.load = load
+        self.unload = unload
+        self.chunk_size = chunk_size
+        self.columns = -(-world_size[0] // chunk_size)
+        self.rows = -(-world_size[1] // chunk_size)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='streaming') if workers else None
+
+        self.pending = {}
+        self.loaded = set()
+
+    def chunks_around(self, center, margin):
+        # every chunk touching the screen around center, grown by margin pixels on each side
+        rect = pygame.Rect(0, 0, SCREEN_WIDTH + margin * 2, SCREEN_HEIGHT + margin * 2)
+        rect.center = center
+        size = self.chunk_size
+        return {
+            (x, y)
+            for x in range(max(rect.left // size, 0), min((rect.right - 1) // size, self.columns - 1) + 1)
+            for y in range(max(rect.top // size, 0), min((rect.bottom - 1) // size, self.rows - 1) + 1)
+        }
+
+    def update(self, center, wait=False):
+        # chunks load one chunk ahead of the screen and unload two chunks behind it
+        wanted = self.chunks_around(center, self.chunk_size)
+        kept = self.chunks_around(center, self.chunk_size * 2)
+
+        for chunk in self.loaded - kept:
+            self.unload(chunk)
+            self.loaded.remove(chunk)
+        for chunk in self.pending.keys() - kept:
+            self.pending.pop(chunk).cancel()
+
+        # nearest chunks first
+        size = self.chunk_size
+        missing = sorted(
+            wanted - self.loaded - self.pending.keys(),
+            key=lambda chunk: (chunk[0] * size - center[0]) ** 2 + (chunk[1] * size - center[1]) ** 2
+        )
+        for chunk in missing:
+            if self.executor is None or wait:
+                self.activate(chunk, self.prepare(chunk))
+            else:
+                self.pending[chunk] = self.executor.submit(self.prepare, chunk)
+
+        for chunk, future in list(self.pending.items()):
+            if future.done() or wait:
+                del self.pending[chunk]
+                self.activate(chunk, future.result())
+
+    def activate(self, chunk, prepared):
+        self.load(chunk, prepared)
+        self.loaded.add(chunk)
@@ -1,27 +1,178 @@
 # coding=utf-8
 from os import walk
 
+import numpy as np
 import pygame
 
+from atlas import atlas_sources, load_atlas
 
-def import_folder(path):
-    surface_list = []
 
-    for _, _, img_files in walk(path):
-        for image in img_files:
-            full_path = f'{path}/{image}'
-            image_surf = pygame.image.load(full_path).convert_alpha()
-            surface_list.append(image_surf)
-    return surface_list
+class AssetCache:
+    def __init__(self):
+        self.surfaces = {}
+        self.folders = {}
+        self.folder_dicts = {}
+        self.sounds = {}
+        self.hits = 0
+        self.misses = 0
 
+        # path -> (store, future) of assets decoding on a thread pool
+        self.pending = {}
+        self.alpha_format = None
 
-def import_folder_dict(path):
-    surface_dict = {}
+        # path -> subsurface of the packed atlas, loaded with the first image or on a thread pool
+        self.atlas = None
+        self.atlas_future = None
+
+    def lookup(self, store, key, load):
+        if key in store:
+            self.hits += 1
+        elif key in self.pending:
+            # decoding already started in the background, wait for it instead of loading twice
+            self.hits += 1
+            store[key] = self.pending.pop(key)[1].result()
+        else:
+            self.misses += 1
+            store[key] = load(key)
+        return store[key]
+
+    @staticmethod
+    def folder_files(path):
+        for _, _, img_files in walk(path):
+            return [(image, f'{path}/{image}') for image in sorted(img_files)]
+        return []
+
+    def load_atlas(self):
+        if self.atlas_future is not None:
+            # packing already started in the background, wait for it instead of loading twice
+            surface, rects = self.atlas_future.result()
+            self.atlas_future = None
+        else:
+            surface, rects = load_atlas()
+        self.atlas = {path: surface.subsurface(rect) for path, rect in rects.items()}
+
+    def load_image(self, path):
+        if path in self.atlas:
+            return self.atlas[path]
+        return pygame.image.load(path).convert_alpha()
+
+    def image(self, path):
+        if self.atlas is None:
+            self.load_atlas()
+        return self.lookup(self.surfaces, path, self.load_image)
+
+    def folder(self, path):
+        return self.lookup(
+            self.folders, path,
+            lambda key: [self.image(full_path) for _, full_path in self.folder_files(key)]
+        )
+
+    def folder_dict(self, path):
+        return self.lookup(
+            self.folder_dicts, path,
+            lambda key: {image.split('.')[0]: self.image(full_path) for image, full_path in self.folder_files(key)}
+        )
+
+    def sound(self, path):
+        return self.lookup(self.sounds, path, pygame.mixer.Sound)
+
+    @staticmethod
+    def decode_image(path, alpha_format):
+        # converting to another surface's format does not touch the display, unlike convert_alpha()
+        return pygame.image.load(path).convert(alpha_format)
+
+    def load_async(self, executor, images=(), sounds=()):
+        # the format template has to be made on the main thread, the decoding runs on the executor
+        if self.alpha_format is None:
+            self.alpha_format = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+        if self.atlas is None and self.atlas_future is None:
+            self.atlas_future = executor.submit(load_atlas, self.alpha_format)
+        packed = self.atlas if self.atlas is not None else set(atlas_sources())
+        for path in images:
+            if path not in self.surfaces and path not in self.pending and path not in packed:
+                self.pending[path] = (self.surfaces, executor.submit(self.decode_image, path, self.alpha_format))
+        for path in sounds:
+            if path not in self.sounds and path not in self.pending:
+                self.pending[path] = (self.sounds, executor.submit(pygame.mixer.Sound, path))
+        futures = [future for _, future in self.pending.values()]
+        if self.atlas_future is not None:
+            futures.append(self.atlas_future)
+        return futures
+
+    def collect(self):
+        # move finished background loads into the cache
+        for path, (store, future) in list(self.pending.items()):
+            if future.done():
+                del self.pending[path]
+                store[path] = future.result()
+        if self.atlas_future is not None and self.atlas_future.done():
+            self.load_atlas()
+
+    def preload(self, images=(), folders=(), sounds=()):
+        for path in images:
+            self.image(path)
+        for path in folders:
+            self.folder(path)
+        for path in sounds:
+            self.sound(path)
+
+    def evict(self, prefix=''):
+        # drop every cached asset whose path starts with prefix, everything by default
+        for store in (self.surfaces, self.folders, self.folder_dicts, self.sounds):
+            for path in [path for path in store if path.startswith(prefix)]:
+                del store[path]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'surfaces': len(self.surfaces),
+            'folders': len(self.folders) + len(self.folder_dicts),
+            'sounds': len(self.sounds)
+        }
 
-    for _, _, img_files in walk(path):
-        for image in img_files:
-            full_path = f'{path}/{image}'
-            image_surf = pygame.image.load(full_path).convert_alpha()
-            surface_dict[image.split('.')[0]] = image_surf
 
-    return surface_dict
+class TextCache:
+    def __init__(self, font, max_size=512):
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = {}
+
+    def render(self, text, color='Black'):
+        key = (text, color)
+        if key not in self.surfaces:
+            if len(self.surfaces) >= self.max_size:
+                self.surfaces.clear()
+            self.surfaces[key] = self.font.render(text, False, color)
+        return self.surfaces[key]
+
+
+def reserve_arrays(pool, names, count, capacity):
+    # grow the named arrays of a pool to at least capacity entries, keeping the first count
+    size = len(getattr(pool, names[0]))
+    if capacity > size:
+        capacity = max(capacity, size * 2)
+        for name in names:
+            array = getattr(pool, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:count] = array[:count]
+            setattr(pool, name, grown)
+
+
+assets = AssetCache()
+
+
+def load_image(path):
+    return assets.image(path)
+
+
+def load_sound(path):
+    return assets.sound(path)
+
+
+def import_folder(path):
+    return assets.folder(path)
+
+
+def import_folder_dict(path):
+    return assets.folder_dict(path)
@@ -0,0 +1,227 @@
+# coding=utf-8
+import json
+import os
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+import pygame
+from pytmx.util_pygame import load_pygame
+
+MAP_CACHE_VERSION = 1
+ATLAS_WIDTH = 1024
+
+
+class TileLayer:
+    def __init__(self, name, data, images):
+        self.name = name
+        self.data = data
+        self.images = images
+
+    def tiles(self):
+        rows, cols = np.nonzero(self.data >= 0)
+        for x, y in zip(cols.tolist(), rows.tolist()):
+            yield x, y, self.images[self.data[y, x]]
+
+    def tiles_in(self, left, top, width, height):
+        # the tiles inside a rectangle of tile coordinates
+        area = self.data[top:top + height, left:left + width]
+        rows, cols = np.nonzero(area >= 0)
+        for x, y, index in zip(cols.tolist(), rows.tolist(), area[rows, cols].tolist()):
+            yield x + left, y + top, self.images[index]
+
+
+class MapObject:
+    def __init__(self, name, x, y, width, height, image):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.image = image
+
+
+class ObjectLayer(list):
+    def __init__(self, name, objects):
+        super().__init__(objects)
+        self.name = name
+
+
+class TileMap:
+    def __init__(self, width, height, tile_width, tile_height, layers):
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.layers = layers
+
+    def get_layer_by_name(self, name):
+        return self.layers[name]
+
+
+def map_sources(path):
+    # the map itself, its external tilesets and every image they reference
+    sources = [path]
+    for tileset in ElementTree.parse(path).getroot().iter('tileset'):
+        base = os.path.dirname(path)
+        if 'source' in tileset.attrib:
+            tileset_path = os.path.normpath(os.path.join(base, tileset.get('source')))
+            sources.append(tileset_path)
+            tileset = ElementTree.parse(tileset_path).getroot()
+            base = os.path.dirname(tileset_path)
+        for image in tileset.iter('image'):
+            sources.append(os.path.normpath(os.path.join(base, image.get('source'))))
+    return sources
+
+
+def source_signature(sources):
+    signature = []
+    for source in sources:
+        stat = os.stat(source)
+        signature.append([source, stat.st_mtime_ns, stat.st_size])
+    return signature
+
+
+def pack_images(images, width=ATLAS_WIDTH):
+    # simple shelf packing, tallest images first
+    rects = [None] * len(images)
+    x = y = shelf_height = 0
+    for index in sorted(range(len(images)), key=lambda i: -images[i].get_height()):
+        image_width, image_height = images[index].get_size()
+        if x + image_width > width:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        rects[index] = (x, y, image_width, image_height)
+        x += image_width
+        shelf_height = max(shelf_height, image_height)
+
+    atlas = pygame.Surface((width, max(1, y + shelf_height)), pygame.SRCALPHA)
+    for image, rect in zip(images, rects):
+        # the atlas is fully transparent, so taking the maximum copies the pixels exactly
+        atlas.blit(image, rect[:2], special_flags=pygame.BLEND_RGBA_MAX)
+    return atlas, rects
+
+
+def compile_map(path, cache_path):
+    tmx_data = load_pygame(path)
+    images = []
+    image_indices = {}
+
+    def image_index(image):
+        if image is None:
+            return -1
+        if id(image) not in image_indices:
+            image_indices[id(image)] = len(images)
+            images.append(image)
+        return image_indices[id(image)]
+
+    arrays = {}
+    layers = []
+    for layer in tmx_data.layers:
+        if hasattr(layer, 'tiles'):
+            data = np.full((tmx_data.height, tmx_data.width), -1, dtype=np.int32)
+            for x, y, image in layer.tiles():
+                data[y, x] = image_index(image)
+            arrays[f'layer_{len(layers)}'] = data
+            layers.append({'name': layer.name, 'type': 'tiles'})
+        else:
+            objects = [
+                [obj.name, obj.x, obj.y, obj.width, obj.height, image_index(obj.image)]
+                for obj in layer
+            ]
+            layers.append({'name': layer.name, 'type': 'objects', 'objects': objects})
+
+    atlas, rects = pack_images(images)
+    arrays['atlas'] = np.dstack((pygame.surfarray.array3d(atlas), pygame.surfarray.array_alpha(atlas)))
+    arrays['rects'] = np.array(rects, dtype=np.int32).reshape(-1, 4)
+    meta = {
+        'version': MAP_CACHE_VERSION,
+        'signature': source_signature(map_sources(path)),
+        'size': [tmx_data.width, tmx_data.height, tmx_data.tilewidth, tmx_data.tileheight],
+        'layers': layers
+    }
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    try:
+        temp_path = f'{cache_path}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # a read-only install still works, it just compiles the map on every launch
+        pass
+    return arrays
+
+
+def read_map_cache(path, cache_path):
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            arrays = {name: cache[name] for name in cache.files}
+        meta = json.loads(str(arrays['meta']))
+        if meta['version'] != MAP_CACHE_VERSION or meta['signature'] != source_signature(map_sources(path)):
+            return None
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    return arrays
+
+
+def build_map(arrays):
+    meta = json.loads(str(arrays['meta']))
+    pixels = arrays['atlas']
+    atlas = pygame.Surface(pixels.shape[:2], pygame.SRCALPHA)
+    pygame.surfarray.blit_array(atlas, pixels[:, :, :3])
+    pygame.surfarray.pixels_alpha(atlas)[:] = pixels[:, :, 3]
+    atlas = atlas.convert_alpha()
+    images = [atlas.subsurface(rect) for rect in arrays['rects'].tolist()]
+
+    layers = {}
+    for index, layer in enumerate(meta['layers']):
+        if layer['type'] == 'tiles':
+            layers[layer['name']] = TileLayer(layer['name'], arrays[f'layer_{index}'], images)
+        else:
+            objects = [
+                MapObject(name, x, y, width, height, images[image] if image >= 0 else None)
+                for name, x, y, width, height, image in layer['objects']
+            ]
+            layers[layer['name']] = ObjectLayer(layer['name'], objects)
+    return TileMap(*meta['size'], layers)
+
+
+def repeat_map(tile_map, columns, rows):
+    # columns x rows copies of a map side by side, the Player layer is kept only once
+    width = tile_map.width * tile_map.tile_width
+    height = tile_map.height * tile_map.tile_height
+    layers = {}
+    for name, layer in tile_map.layers.items():
+        if isinstance(layer, TileLayer):
+            layers[name] = TileLayer(name, np.tile(layer.data, (rows, columns)), layer.images)
+        elif name == 'Player':
+            layers[name] = layer
+        else:
+            objects = [
+                MapObject(obj.name, obj.x + column * width, obj.y + row * height, obj.width, obj.height, obj.image)
+                for row in range(rows) for column in range(columns) for obj in layer
+            ]
+            layers[name] = ObjectLayer(name, objects)
+    return TileMap(
+        tile_map.width * columns, tile_map.height * rows, tile_map.tile_width, tile_map.tile_height, layers
+    )
+
+
+maps = {}
+
+
+def load_map(path):
+    # every caller shares one in-memory map, the compiled cache lives next to the .tmx file
+    if path not in maps:
+        cache_path = f'{path}.npz'
+        arrays = read_map_cache(path, cache_path)
+        if arrays is None:
+            arrays = compile_map(path, cache_path)
+        maps[path] = build_map(arrays)
+    return maps[path]
+
+
+if __name__ == '__main__':
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    compile_map('../data/map.tmx', '../data/map.tmx.npz')
@@ -1,24 +1,80 @@
-import pygame
+import heapq
+import itertools
+
+
+class GameClock:
+    def __init__(self):
+        self.ticks = 0  # game time in milliseconds
+        self.paused = False
+        self.time_scale = 1
+
+        # scheduled callbacks as a min-heap of [due time, order, callback]
+        self.queue = []
+        self.order = itertools.count()
+
+    def get_ticks(self):
+        return self.ticks
+
+    def tick(self, dt):
+        # returns the game time that passed in seconds, 0 while paused
+        if self.paused:
+            return 0
+        dt *= self.time_scale
+        self.ticks += dt * 1000
+
+        queue = self.queue
+        while queue and queue[0][0] <= self.ticks:
+            callback = heapq.heappop(queue)[2]
+            if callback:
+                callback()
+        return dt
+
+    def schedule(self, delay, callback):
+        # callback runs once delay milliseconds of game time have passed
+        entry = [self.ticks + delay, next(self.order), callback]
+        heapq.heappush(self.queue, entry)
+        return entry
+
+    @staticmethod
+    def cancel(entry):
+        entry[2] = None
+
+    def reset(self):
+        self.ticks = 0
+        self.paused = False
+        self.time_scale = 1
+        self.queue.clear()
+
+
+# advanced by Level.update, so timers follow game time instead of the wall clock
+clock = GameClock()
+
+# keeps running while the game clock is paused, e.g. for menus
+ui_clock = GameClock()
 
 
 class Timer:
-    def __init__(self, duration, func=None):
+    def __init__(self, duration, func=None, clock=clock):
         self.duration = duration
         self.func = func
-        self.start_time = 0
+        self.clock = clock
+        self.entry = None
         self.active = False
 
     def activate(self):
+        if self.entry:
+            self.clock.cancel(self.entry)
         self.active = True
-        self.start_time = pygame.time.get_ticks()
+        self.entry = self.clock.schedule(self.duration, self.expire)
 
     def deactivate(self):
+        if self.entry:
+            self.clock.cancel(self.entry)
+        self.active = False
+        self.entry = None
+
+    def expire(self):
+        self.entry = None
         self.active = False
-        self.start_time = 0
-
-    def update(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.duration:
-            if self.func and self.start_time != 0:
-                self.func()
-            self.deactivate()
+        if self.func:
+            self.func()
@@ -1,29 +1,23 @@
-import pygame
 from settings import *
 
 
 class Transition:
     def __init__(self, reset, player):
         # setup
-        self.display_surface = pygame.display.get_surface()
         self.reset = reset
         self.player = player
 
-        # overlay image
-        self.image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.color = 255
-        self.speed = -2
+        # screen brightness, faded out and back in while the player sleeps
+        self.brightness = 255
+        self.speed = -TRANSITION_SPEED
 
-    def play(self):
-
-        self.color += self.speed
-        if self.color <= 0:
+    def play(self, dt):
+        self.brightness += self.speed * dt
+        if self.brightness <= 0:
             self.speed *= -1
-            self.color = 0
-        if self.color > 255:
-            self.color = 255
+            self.brightness = 0
+        if self.brightness > 255:
+            self.brightness = 255
             self.reset()
             self.player.sleep = False
-            self.speed = -2
-        self.image.fill((self.color, self.color, self.color))
-        self.display_surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            self.speed = -TRANSITION_SPEED